@@ -0,0 +1,325 @@
+"""
+Gemini Proxy - Server-side recipe generation with pooling and caching
+
+Wraps the Gemini REST API behind a single pooled HTTP client so that recipe
+requests coming from many browsers share connections, are bounded in
+concurrency, retried with backoff, and answered from cache when the same
+inventory + cuisine + dietary combination has been seen before.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Mirrors the systemInstruction used by services/geminiService.ts
+SYSTEM_INSTRUCTION = (
+    "You are a Computational Gastronomist. Focus on molecular pairings and zero-waste impact."
+)
+
+# Status codes worth retrying (rate limits and transient upstream failures)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class GeminiProxyError(Exception):
+    """Raised when Gemini cannot produce a usable response"""
+
+    def __init__(self, message: str, status_code: int = 502):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def normalize_gemini_input(gemini_input: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduce prepare_gemini_input() output to the fields that affect recipes
+
+    Per-shot noise (confidence, bounding boxes, model version) is dropped and
+    ingredients are sorted, so two photos of the same fridge map to one key.
+
+    Args:
+        gemini_input: Output from prepare_gemini_input()
+
+    Returns:
+        Canonical dict suitable for hashing and prompting
+    """
+    context = gemini_input.get("context", {}) or {}
+    inventory = []
+    for item in gemini_input.get("inventory", []) or []:
+        inventory.append({
+            "name": str(item.get("name", "unknown")).strip().lower(),
+            "quantity": str(item.get("quantity", "")).strip().lower(),
+            "category": str(item.get("category", "produce")).strip().lower(),
+        })
+    inventory.sort(key=lambda i: (i["name"], i["quantity"], i["category"]))
+
+    dietary = context.get("dietary", {}) or {}
+    return {
+        "inventory": inventory,
+        "cuisine": str(context.get("cuisine", "Global/Fusion")).strip(),
+        "dietary": {k: dietary[k] for k in sorted(dietary) if dietary[k]},
+    }
+
+
+def make_cache_key(normalized: Dict[str, Any], model: str) -> str:
+    """Stable hash of a normalized request and target model"""
+    payload = json.dumps({"model": model, **normalized}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def build_recipe_request(normalized: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build a generateContent request body for recipe synthesis
+
+    Args:
+        normalized: Output from normalize_gemini_input()
+
+    Returns:
+        JSON body for the Gemini REST API
+    """
+    names = ", ".join(item["name"] for item in normalized["inventory"]) or "pantry staples"
+    prompt = (
+        f"Synthesize 2 {normalized['cuisine']} protocols for: {names}. "
+        "Include molecular substitutions and economic impact. "
+        'Return JSON of the form {"protocols": [...]}.'
+    )
+    if normalized["dietary"]:
+        prompt += f" Dietary constraints: {json.dumps(normalized['dietary'], sort_keys=True)}."
+
+    return {
+        "systemInstruction": {"parts": [{"text": SYSTEM_INSTRUCTION}]},
+        "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+        "generationConfig": {"responseMimeType": "application/json"},
+    }
+
+
+class ResponseCache:
+    """In-memory LRU cache with per-entry TTL"""
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return cached value or None if missing/expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if self.ttl > 0 and time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Dict[str, Any]):
+        """Store value, evicting the least recently used entry if full"""
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class GeminiProxy:
+    """Pooled, rate-bounded and cached client for Gemini recipe generation"""
+
+    def __init__(
+        self,
+        api_key: str = "",
+        model: str = "gemini-3-pro-preview",
+        base_url: str = "https://generativelanguage.googleapis.com",
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        timeout: float = 30.0,
+        cache_size: int = 256,
+        cache_ttl: float = 3600.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """
+        Args:
+            api_key: Default Gemini API key (may be overridden per call)
+            model: Gemini model name
+            base_url: Gemini REST endpoint; point at a fake server in tests
+            max_concurrency: Max in-flight upstream requests
+            max_retries: Retries on 429/5xx/transport errors
+            backoff_base: Initial backoff in seconds (doubles per attempt)
+            timeout: Per-request upstream timeout in seconds
+            cache_size: Max cached responses (0 disables caching)
+            cache_ttl: Cached response lifetime in seconds
+            transport: Optional httpx transport (e.g. ASGITransport for tests)
+        """
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.timeout = timeout
+        self.transport = transport
+        self.cache = ResponseCache(max_entries=cache_size, ttl=cache_ttl)
+        self.stats = {"requests": 0, "cache_hits": 0, "deduplicated": 0, "upstream_calls": 0, "retries": 0}
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Lazily create the pooled client inside the running event loop"""
+        if self._client is None or self._client.is_closed:
+            limits = httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            )
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=limits,
+                transport=self.transport,
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def close(self):
+        """Release pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def generate_recipes(self, gemini_input: Dict[str, Any], api_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Generate recipes for a prepare_gemini_input() payload
+
+        Identical normalized requests are answered from cache, and concurrent
+        identical requests share a single upstream call.
+
+        Args:
+            gemini_input: Output from prepare_gemini_input()
+            api_key: Optional per-request key overriding the default
+
+        Returns:
+            Dict with protocols and a "cached" flag
+        """
+        self.stats["requests"] += 1
+        normalized = normalize_gemini_input(gemini_input)
+        key = make_cache_key(normalized, self.model)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            return {**cached, "cached": True}
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats["deduplicated"] += 1
+            result = await asyncio.shield(inflight)
+            return {**result, "cached": True}
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._call_upstream(normalized, api_key or self.api_key)
+            self.cache.set(key, result)
+            future.set_result(result)
+            return {**result, "cached": False}
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so waiters-free failures don't log "never retrieved"
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+            if not future.done():
+                # Owner was cancelled (client disconnect, shutdown); release
+                # the deduplicated waiters instead of leaving them hanging
+                future.set_exception(GeminiProxyError("Upstream call was cancelled", status_code=503))
+                future.exception()
+
+    async def _call_upstream(self, normalized: Dict[str, Any], api_key: str) -> Dict[str, Any]:
+        """POST to Gemini with bounded concurrency and exponential backoff"""
+        if not api_key:
+            raise GeminiProxyError("Gemini API key not configured", status_code=401)
+
+        client = self._get_client()
+        body = build_recipe_request(normalized)
+        url = f"/v1beta/models/{self.model}:generateContent"
+        delay = self.backoff_base
+        last_error = "unknown error"
+
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                self.stats["retries"] += 1
+                # Full jitter keeps retrying clients from synchronizing
+                await asyncio.sleep(random.uniform(0, delay))
+                delay *= 2
+
+            try:
+                async with self._semaphore:
+                    self.stats["upstream_calls"] += 1
+                    response = await client.post(url, json=body, headers={"x-goog-api-key": api_key})
+            except httpx.TransportError as e:
+                last_error = f"transport error: {e}"
+                logger.warning(f"Gemini attempt {attempt + 1} failed: {last_error}")
+                continue
+
+            if response.status_code in RETRYABLE_STATUS:
+                last_error = f"HTTP {response.status_code}"
+                logger.warning(f"Gemini attempt {attempt + 1} failed: {last_error}")
+                continue
+            if response.status_code >= 400:
+                raise GeminiProxyError(
+                    f"Gemini rejected request: HTTP {response.status_code}",
+                    status_code=401 if response.status_code in (401, 403) else 502,
+                )
+            return self._parse_response(response.json())
+
+        raise GeminiProxyError(f"Gemini unavailable after {self.max_retries + 1} attempts ({last_error})", status_code=503)
+
+    @staticmethod
+    def _parse_response(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract the JSON recipe catalog from a generateContent response"""
+        try:
+            parts = data["candidates"][0]["content"]["parts"]
+            text = "".join(part.get("text", "") for part in parts)
+            parsed = json.loads(text)
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            raise GeminiProxyError(f"Malformed Gemini response: {e}")
+        return {"protocols": parsed.get("protocols", []) if isinstance(parsed, dict) else []}
+
+
+# Singleton proxy instance
+_proxy_instance = None
+
+
+def get_gemini_proxy() -> GeminiProxy:
+    """Get singleton proxy configured from settings"""
+    global _proxy_instance
+    if _proxy_instance is None:
+        from app.config import get_settings
+        settings = get_settings()
+        _proxy_instance = GeminiProxy(
+            api_key=settings.gemini_api_key,
+            model=settings.gemini_model,
+            base_url=settings.gemini_base_url,
+            max_concurrency=settings.gemini_max_concurrency,
+            max_retries=settings.gemini_max_retries,
+            timeout=settings.gemini_timeout,
+            cache_size=settings.gemini_cache_size,
+            cache_ttl=settings.gemini_cache_ttl,
+        )
+    return _proxy_instance
@@ -12,6 +12,86 @@ class Settings(BaseSettings):
     ml_inference_timeout: float = 2.0
     mock_mode: bool = False
     
+    # Model artifact store
+    model_store_dir: str = "models"
+    detector_model: str = "yolov8n.pt"
+    detector_model_version: str = ""
+    detector_artifact_kind: str = "state"
+    verify_model_checksums: bool = True
+    
+    # Performance tiers (balanced uses ML_INFERENCE_TIMEOUT)
+    default_tier: str = "balanced"
+    tier_fast_timeout: float = 1.0
+    tier_accurate_timeout: float = 8.0
+    
+    # Mock-mode simulator
+    mock_seed: int = 0
+    mock_detections_mean: float = 3.0
+    mock_max_detections: int = 12
+    mock_latency_mode: str = "sleep"
+    mock_detect_latency: float = 0.18
+    mock_freshness_latency: float = 0.025
+    mock_latency_sigma: float = 0.35
+    mock_replay_file: str = ""
+    
+    # Detection cascade
+    detection_cascade: bool = False
+    cascade_low_res: int = 320
+    cascade_candidate_conf: float = 0.1
+    cascade_accept_conf: float = 0.8
+    
+    # Worker processes and thread limits
+    uvicorn_workers: int = 1
+    torch_intra_op_threads: int = 0
+    torch_inter_op_threads: int = 0
+    cv2_threads: int = 0
+    cpu_affinity: bool = False
+    
+    # Near-duplicate result reuse
+    enable_near_duplicate_reuse: bool = False
+    near_duplicate_max_distance: int = 6
+    near_duplicate_index_size: int = 512
+    
+    # Batch jobs
+    jobs_db_path: str = "jobs.sqlite3"
+    job_workers: int = 1
+    job_image_timeout: float = 30.0
+    job_result_ttl: float = 3600.0
+    job_lease_seconds: float = 60.0
+    job_max_attempts: int = 3
+    
+    # Inference scheduler and per-client fairness
+    inference_slots: int = 1
+    interactive_reserved_slots: int = 1
+    client_rate_limit: float = 0.0
+    client_burst: float = 20.0
+    client_weights: str = ""
+    api_keys: str = ""
+    scheduler_max_queue: int = 256
+    
+    # Memory ceiling and leak diagnostics
+    memory_ceiling_mb: int = 0
+    memory_soft_ratio: float = 0.85
+    memory_check_interval: float = 5.0
+    tracemalloc_frames: int = 10
+    
+    # Admin endpoints and sampling profiler
+    admin_token: str = ""
+    profiling_sample_rate: float = 0.0
+    profiling_interval: float = 0.005
+    profiling_dir: str = "profiles"
+    profiling_keep: int = 200
+    
+    # Gemini proxy
+    gemini_api_key: str = ""
+    gemini_model: str = "gemini-3-pro-preview"
+    gemini_base_url: str = "https://generativelanguage.googleapis.com"
+    gemini_max_concurrency: int = 4
+    gemini_max_retries: int = 3
+    gemini_timeout: float = 30.0
+    gemini_cache_size: int = 256
+    gemini_cache_ttl: float = 3600.0
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
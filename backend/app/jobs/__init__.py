@@ -0,0 +1,5 @@
+"""Jobs Module - durable asynchronous analysis jobs"""
+from .store import JobStore
+from .runner import JobRunner
+
+__all__ = ["JobStore", "JobRunner"]
@@ -0,0 +1,173 @@
+"""Background executor that drains the job store onto the inference pool"""
+import asyncio
+import io
+import logging
+import os
+import socket
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Optional, TYPE_CHECKING
+from PIL import Image
+
+from .store import JobStore
+
+if TYPE_CHECKING:
+    from app.scheduling import FairScheduler
+
+logger = logging.getLogger(__name__)
+
+AnalyzeFn = Callable[[Image.Image, Dict[str, Any]], Dict[str, Any]]
+
+
+class JobRunner:
+    """Claims queued jobs by priority and runs each image on a thread pool"""
+
+    def __init__(
+        self,
+        store: JobStore,
+        analyze_fn: AnalyzeFn,
+        workers: int = 1,
+        result_ttl: float = 3600.0,
+        poll_interval: float = 1.0,
+        purge_interval: float = 60.0,
+        scheduler: Optional["FairScheduler"] = None,
+        lease: float = 60.0,
+        image_timeout: Optional[float] = None,
+        max_attempts: int = 3,
+    ):
+        """
+        Args:
+            store: Durable job store
+            analyze_fn: Runs perception on one PIL image with the job's params (blocking)
+            workers: Jobs processed concurrently
+            result_ttl: Seconds finished results are kept
+            poll_interval: Max idle wait before re-checking the queue
+            purge_interval: Seconds between expired-job sweeps
+            scheduler: Runs images in the batch lane (own thread pool if None)
+            lease: Seconds a claim stays valid without a heartbeat; jobs whose
+                lease lapses (their worker died) are requeued
+            image_timeout: Per-image deadline for jobs whose params carry no
+                "timeout" (None waits indefinitely); an overrunning image still
+                holds its worker until it finishes
+            max_attempts: Claims before a job whose worker keeps dying is failed
+        """
+        self.store = store
+        self.analyze_fn = analyze_fn
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.purge_interval = purge_interval
+        self.scheduler = scheduler
+        self.lease = lease
+        self.image_timeout = image_timeout
+        self.max_attempts = max_attempts
+        # Unique per runner, so sibling uvicorn workers never share an owner
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks = []
+        self._last_purge = 0.0
+
+    async def start(self):
+        """Requeue jobs whose worker died and start worker loops"""
+        self._wakeup = asyncio.Event()
+        await asyncio.to_thread(self._requeue_interrupted)
+        self._tasks = [asyncio.create_task(self._worker_loop()) for _ in range(self.workers)]
+        logger.info(f"Job runner started with {self.workers} worker(s)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._executor.shutdown(wait=False)
+
+    def notify(self):
+        """Wake idle workers after a submission"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _worker_loop(self):
+        while True:
+            now = time.time()
+            if now - self._last_purge > self.purge_interval:
+                self._last_purge = now
+                await asyncio.to_thread(self._requeue_interrupted)
+                await asyncio.to_thread(self.store.purge_expired)
+
+            job = await asyncio.to_thread(self.store.claim_next, self.owner, self.lease)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self.run_job(job)
+
+    def _requeue_interrupted(self) -> int:
+        return self.store.requeue_interrupted(max_attempts=self.max_attempts, ttl=self.result_ttl)
+
+    async def run_job(self, job: Dict[str, Any]):
+        """Run every image of a job, recording progress after each"""
+        job_id = job["id"]
+        timeout = job["params"].get("timeout", self.image_timeout)
+        loop = asyncio.get_running_loop()
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            inputs = await asyncio.to_thread(self.store.load_inputs, job_id)
+            results = []
+            for i, (filename, data) in enumerate(inputs):
+                try:
+                    image = Image.open(io.BytesIO(data)).convert("RGB")
+                    if self.scheduler is not None:
+                        # Already rate-limited at submission
+                        result = await self.scheduler.submit(
+                            self.analyze_fn, image, job["params"],
+                            client=job["params"].get("client", "jobs"), lane="batch", charge=False,
+                            timeout=timeout
+                        )
+                    else:
+                        work = loop.run_in_executor(self._executor, self.analyze_fn, image, job["params"])
+                        work.add_done_callback(lambda f: f.cancelled() or f.exception())
+                        try:
+                            result = await asyncio.wait_for(asyncio.shield(work), timeout)
+                        except asyncio.TimeoutError:
+                            raise TimeoutError(f"Inference exceeded {timeout}s timeout")
+                    results.append({"filename": filename, **result})
+                except Exception as e:
+                    logger.error(f"Job {job_id} image {filename} failed: {e}")
+                    results.append({"filename": filename, "error": str(e)})
+
+                await asyncio.to_thread(
+                    self.store.update_progress,
+                    job_id,
+                    (i + 1) / len(inputs),
+                    f"{i + 1}/{len(inputs)} images analyzed",
+                    {"results": results},
+                    self.owner,
+                )
+
+            await asyncio.to_thread(
+                self.store.finish, job_id, {"results": results}, None, self.result_ttl, self.owner
+            )
+            logger.info(f"Job {job_id} finished ({len(inputs)} images)")
+
+        except asyncio.CancelledError:
+            # Left as running; requeued once the lease lapses
+            raise
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            await asyncio.to_thread(self.store.finish, job_id, None, str(e), self.result_ttl, self.owner)
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job_id: str):
+        """Renew the job's lease at a third of its length while it runs"""
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            if not await asyncio.to_thread(self.store.renew_lease, job_id, self.owner, self.lease):
+                logger.warning(f"Lost lease on job {job_id}; another worker may have taken it")
+                return
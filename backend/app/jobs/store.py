@@ -0,0 +1,274 @@
+"""SQLite-backed job store with priority claiming and result TTL"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL DEFAULT '{}',
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_expires_at REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created_at);
+CREATE TABLE IF NOT EXISTS job_inputs (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    filename TEXT,
+    data BLOB NOT NULL,
+    PRIMARY KEY (job_id, idx)
+);
+"""
+
+
+class JobStore:
+    """Durable job queue; all state lives in one SQLite file"""
+
+    def __init__(self, path: str = "jobs.sqlite3"):
+        """
+        Args:
+            path: SQLite database file (":memory:" for throwaway stores)
+        """
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            # Databases created before leases existed
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("owner", "TEXT"), ("lease_expires_at", "REAL")):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def submit(
+        self,
+        inputs: List[Tuple[str, bytes]],
+        kind: str = "analyze",
+        priority: int = 0,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """
+        Persist a new queued job and its input images
+
+        Args:
+            inputs: (filename, bytes) pairs
+            kind: Job type
+            priority: Higher runs first
+            params: JSON-serializable job options
+
+        Returns:
+            Job ID
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT INTO jobs (id, kind, priority, status, params, created_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                    (job_id, kind, priority, json.dumps(params or {}), time.time()),
+                )
+                self._conn.executemany(
+                    "INSERT INTO job_inputs (job_id, idx, filename, data) VALUES (?, ?, ?, ?)",
+                    [(job_id, i, name, sqlite3.Binary(data)) for i, (name, data) in enumerate(inputs)],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return job_id
+
+    def claim_next(self, owner: str = "", lease: float = 60.0) -> Optional[Dict[str, Any]]:
+        """
+        Atomically move the highest-priority queued job to running
+
+        Args:
+            owner: Claiming worker's ID, recorded with the lease
+            lease: Seconds the claim is valid unless renewed
+
+        Returns:
+            Claimed job, or None if the queue is empty
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                """
+                UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1,
+                    owner = ?, lease_expires_at = ?
+                WHERE id = (
+                    SELECT id FROM jobs WHERE status = 'queued'
+                    ORDER BY priority DESC, created_at ASC LIMIT 1
+                )
+                RETURNING *
+                """,
+                (now, owner, now + lease),
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def renew_lease(self, job_id: str, owner: str, lease: float = 60.0) -> bool:
+        """Extend a running job's lease; False if this owner no longer holds it"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND owner = ? AND status = 'running'",
+                (time.time() + lease, job_id, owner),
+            )
+        return cursor.rowcount == 1
+
+    def load_inputs(self, job_id: str) -> List[Tuple[str, bytes]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT filename, data FROM job_inputs WHERE job_id = ? ORDER BY idx", (job_id,)
+            ).fetchall()
+        return [(row["filename"], bytes(row["data"])) for row in rows]
+
+    def update_progress(
+        self,
+        job_id: str,
+        progress: float,
+        message: Optional[str] = None,
+        partial: Any = None,
+        owner: Optional[str] = None,
+    ) -> bool:
+        """
+        Record progress (0-1) and optionally a partial result
+
+        With owner set, the write only applies while that owner holds the
+        job, so a worker that lost its lease cannot clobber the new run.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                """
+                UPDATE jobs SET progress = ?, message = ?, result = COALESCE(?, result)
+                WHERE id = ? AND (? IS NULL OR owner = ?)
+                """,
+                (progress, message, json.dumps(partial) if partial is not None else None, job_id, owner, owner),
+            )
+        return cursor.rowcount == 1
+
+    def finish(
+        self,
+        job_id: str,
+        result: Any = None,
+        error: Optional[str] = None,
+        ttl: float = 3600.0,
+        owner: Optional[str] = None,
+    ) -> bool:
+        """Mark a job succeeded (or failed if error is set) and start its TTL"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                """
+                UPDATE jobs SET status = ?, progress = CASE WHEN ? IS NULL THEN 1 ELSE progress END,
+                    result = COALESCE(?, result), error = ?, finished_at = ?, expires_at = ?,
+                    lease_expires_at = NULL
+                WHERE id = ? AND (? IS NULL OR owner = ?)
+                """,
+                (
+                    "failed" if error else "succeeded", error,
+                    json.dumps(result) if result is not None else None, error,
+                    now, now + ttl, job_id, owner, owner,
+                ),
+            )
+            if cursor.rowcount == 0:
+                return False
+            # Inputs are only needed until the job has run
+            self._conn.execute("DELETE FROM job_inputs WHERE job_id = ?", (job_id,))
+        return True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = self._to_dict(row)
+        if job["expires_at"] is not None and job["expires_at"] < time.time():
+            return None
+        return job
+
+    def requeue_interrupted(self, max_attempts: int = 3, ttl: float = 3600.0) -> int:
+        """
+        Return running jobs whose lease expired (their worker died) to the queue
+
+        Jobs still heartbeating, e.g. on a sibling uvicorn worker, are left alone.
+        A job that has already been claimed max_attempts times is failed instead,
+        so an input that crashes or OOM-kills its worker cannot loop forever.
+
+        Args:
+            max_attempts: Claims allowed before an interrupted job is failed
+            ttl: Seconds a failed job is kept
+
+        Returns:
+            Number of jobs requeued
+        """
+        now = time.time()
+        expired = "status = 'running' AND (lease_expires_at IS NULL OR lease_expires_at < ?)"
+        with self._lock:
+            failed = self._conn.execute(
+                f"""
+                UPDATE jobs SET status = 'failed', owner = NULL, lease_expires_at = NULL,
+                    error = 'worker lost ' || attempts || ' time(s) while running this job; giving up',
+                    finished_at = ?, expires_at = ?
+                WHERE {expired} AND attempts >= ?
+                RETURNING id
+                """,
+                (now, now + ttl, now, max_attempts),
+            ).fetchall()
+            for row in failed:
+                self._conn.execute("DELETE FROM job_inputs WHERE job_id = ?", (row["id"],))
+            cursor = self._conn.execute(
+                f"""
+                UPDATE jobs SET status = 'queued', owner = NULL, lease_expires_at = NULL,
+                    message = 'requeued after worker loss'
+                WHERE {expired}
+                """,
+                (now,),
+            )
+        if failed:
+            logger.warning(f"Failed {len(failed)} job(s) that exhausted {max_attempts} attempts")
+        if cursor.rowcount:
+            logger.info(f"Requeued {cursor.rowcount} interrupted job(s)")
+        return cursor.rowcount
+
+    def purge_expired(self) -> int:
+        """Delete finished jobs past their TTL"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)
+            )
+        return cursor.rowcount
+
+    def queue_depth(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["params"] = json.loads(job["params"]) if job["params"] else {}
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
@@ -0,0 +1,225 @@
+"""Process memory accounting, heap snapshots and RSS watchdog"""
+import asyncio
+import ctypes
+import gc
+import logging
+import os
+import signal
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from typing import Callable, Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        import resource
+        # ru_maxrss is a peak, in KiB on Linux; best available elsewhere
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def release_free_memory() -> int:
+    """
+    Collect garbage and return freed heap pages to the OS
+
+    glibc keeps freed arenas mapped; malloc_trim hands them back, which is
+    where most allocator-fragmentation RSS growth is recovered.
+
+    Returns:
+        Bytes of RSS released (may be 0)
+    """
+    before = current_rss()
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+    return max(0, before - current_rss())
+
+
+class HeapSnapshots:
+    """On-demand tracemalloc snapshots with diffing (bounded history)"""
+
+    def __init__(self, frames: int = 10, keep: int = 5):
+        self.frames = frames
+        self.keep = keep
+        self._snapshots: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        """Begin tracing allocations (adds overhead until stopped)"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            logger.info(f"tracemalloc started ({self.frames} frames)")
+
+    def stop(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+
+    def take(self) -> Dict[str, Any]:
+        """Capture a snapshot, starting tracing first if needed"""
+        self.start()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        traced, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            self._counter += 1
+            snapshot_id = str(self._counter)
+            info = {"id": snapshot_id, "taken_at": time.time(), "traced_bytes": traced, "peak_bytes": peak, "rss_bytes": current_rss()}
+            self._snapshots[snapshot_id] = {"snapshot": snapshot, "info": info}
+            while len(self._snapshots) > self.keep:
+                self._snapshots.popitem(last=False)
+        return info
+
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [entry["info"] for entry in self._snapshots.values()]
+
+    def diff(self, base_id: str, target_id: str, limit: int = 25, group_by: str = "lineno") -> List[Dict[str, Any]]:
+        """
+        Largest allocation changes between two snapshots
+
+        Args:
+            base_id: Earlier snapshot ID
+            target_id: Later snapshot ID
+            limit: Max entries returned
+            group_by: "lineno", "filename" or "traceback"
+
+        Returns:
+            Entries sorted by absolute size change
+        """
+        with self._lock:
+            base = self._snapshots.get(base_id)
+            target = self._snapshots.get(target_id)
+        if base is None or target is None:
+            raise KeyError("Unknown snapshot id")
+
+        stats = target["snapshot"].compare_to(base["snapshot"], group_by)
+        return [
+            {
+                "location": [str(frame) for frame in stat.traceback.format()[-4:]],
+                "size_bytes": stat.size,
+                "size_diff_bytes": stat.size_diff,
+                "count": stat.count,
+                "count_diff": stat.count_diff,
+            }
+            for stat in stats[:limit]
+        ]
+
+
+class MemoryWatchdog:
+    """
+    Watches RSS against a per-worker budget
+
+    Above the soft limit it trims the heap. Above the hard ceiling it asks
+    the server to shut this worker down gracefully (SIGTERM): uvicorn stops
+    accepting connections, finishes in-flight requests, and the process
+    manager (uvicorn --workers, gunicorn, systemd, docker) starts a fresh one.
+    Without a supervisor (a single uvicorn process, or --reload) nothing would
+    restart it, so the ceiling is only reported and the worker keeps serving.
+    """
+
+    def __init__(
+        self,
+        ceiling_bytes: int,
+        soft_ratio: float = 0.85,
+        interval: float = 5.0,
+        on_recycle: Optional[Callable[[], None]] = None,
+        supervised: bool = True,
+    ):
+        """
+        Args:
+            ceiling_bytes: Hard RSS budget (0 disables the watchdog)
+            soft_ratio: Fraction of the ceiling where trimming starts
+            interval: Seconds between checks
+            on_recycle: Called to recycle the worker (default: SIGTERM to self)
+            supervised: Whether a process manager restarts exited workers
+        """
+        self.ceiling_bytes = ceiling_bytes
+        self.soft_bytes = int(ceiling_bytes * soft_ratio)
+        self.interval = interval
+        self.on_recycle = on_recycle or _graceful_shutdown
+        self.supervised = supervised
+        self.recycling = False
+        self._over_reported = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.ceiling_bytes > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+            logger.info(f"Memory watchdog: ceiling {self.ceiling_bytes / 2**20:.0f}MB, soft {self.soft_bytes / 2**20:.0f}MB")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while not self.recycling:
+            await asyncio.sleep(self.interval)
+            self.check()
+
+    def check(self) -> str:
+        """Evaluate RSS once; returns "ok", "trimmed", "over" (unsupervised) or "recycle" """
+        rss = current_rss()
+        if rss >= self.soft_bytes:
+            released = release_free_memory()
+            logger.info(f"RSS {rss / 2**20:.0f}MB over soft limit; trimmed {released / 2**20:.1f}MB")
+            rss = current_rss()
+            if rss < self.ceiling_bytes:
+                return "trimmed"
+
+        if rss >= self.ceiling_bytes and not self.supervised:
+            if not self._over_reported:
+                logger.error(
+                    f"RSS {rss / 2**20:.0f}MB over ceiling {self.ceiling_bytes / 2**20:.0f}MB, but nothing "
+                    f"would restart this worker (UVICORN_WORKERS <= 1); not recycling"
+                )
+                self._over_reported = True
+            return "over"
+
+        if rss >= self.ceiling_bytes:
+            logger.warning(
+                f"RSS {rss / 2**20:.0f}MB over ceiling {self.ceiling_bytes / 2**20:.0f}MB; "
+                f"recycling worker {os.getpid()}"
+            )
+            self.recycling = True
+            self.on_recycle()
+            return "recycle"
+        return "ok"
+
+
+def _graceful_shutdown():
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+# Singleton snapshot store
+_heap_snapshots = None
+
+
+def get_heap_snapshots() -> HeapSnapshots:
+    """Get process-wide heap snapshot store"""
+    global _heap_snapshots
+    if _heap_snapshots is None:
+        from app.config import get_settings
+        _heap_snapshots = HeapSnapshots(frames=get_settings().tracemalloc_frames)
+    return _heap_snapshots
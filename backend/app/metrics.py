@@ -0,0 +1,90 @@
+"""In-process metrics registry (counters and latency summaries)"""
+import math
+import threading
+from collections import deque
+from typing import Dict, Any, Tuple
+
+
+def _key(name: str, labels: Dict[str, Any]) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class MetricsRegistry:
+    """Thread-safe counters and rolling summaries, exported as JSON"""
+
+    def __init__(self, window: int = 1024):
+        """
+        Args:
+            window: Recent observations kept per summary for percentiles
+        """
+        self.window = window
+        self._counters: Dict[tuple, float] = {}
+        self._summaries: Dict[tuple, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, amount: float = 1, **labels):
+        """Add to a counter"""
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        """Record one observation (e.g. a latency in seconds)"""
+        key = _key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = {"count": 0, "sum": 0.0, "max": 0.0, "recent": deque(maxlen=self.window)}
+                self._summaries[key] = summary
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["max"] = max(summary["max"], value)
+            summary["recent"].append(value)
+
+    def counter(self, name: str, **labels) -> float:
+        """Current value of a counter (0 if never incremented)"""
+        with self._lock:
+            return self._counters.get(_key(name, labels), 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serializable view of all metrics"""
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            summaries = []
+            for (name, labels), s in sorted(self._summaries.items(), key=lambda item: item[0]):
+                recent = sorted(s["recent"])
+                summaries.append({
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": s["count"],
+                    "mean": s["sum"] / s["count"] if s["count"] else 0.0,
+                    "max": s["max"],
+                    "p50": _percentile(recent, 50),
+                    "p95": _percentile(recent, 95),
+                    "p99": _percentile(recent, 99),
+                })
+        return {"counters": counters, "summaries": summaries}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+
+def _percentile(ordered, q: float):
+    if not ordered:
+        return None
+    rank = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+# Singleton registry
+_registry = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Get process-wide metrics registry"""
+    return _registry
@@ -0,0 +1,213 @@
+"""Local, versioned model artifact store with checksum verification"""
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+ACTIVE = "ACTIVE"
+
+_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+
+class ArtifactError(Exception):
+    """Missing, unregistered or corrupt model artifact"""
+
+
+def sha256_file(path: Path, chunk_size: int = 1 << 20) -> str:
+    """Hex SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactStore:
+    """
+    Directory of model versions, each with a manifest of checksummed files
+
+    Layout::
+
+        <root>/<name>/<version>/manifest.json
+        <root>/<name>/<version>/<files...>
+        <root>/<name>/ACTIVE              (version used when none is pinned)
+
+    A version holds several kinds of file for the same model, e.g. the
+    original "weights" checkpoint, a fast-loading "state" file and exported
+    engines ("onnx", "openvino", ...). Nothing here touches the network.
+    """
+
+    def __init__(self, root: str = "models"):
+        """
+        Args:
+            root: Store directory
+        """
+        self.root = Path(root)
+
+    def has(self, name: str) -> bool:
+        return bool(self.versions(name))
+
+    def versions(self, name: str) -> List[str]:
+        """Registered versions, oldest first"""
+        model_dir = self.root / name
+        if not model_dir.is_dir():
+            return []
+        manifests = [(p.stat().st_mtime, p.parent.name) for p in model_dir.glob(f"*/{MANIFEST}")]
+        return [version for _, version in sorted(manifests)]
+
+    def active_version(self, name: str) -> Optional[str]:
+        """Version marked ACTIVE, else the newest registered"""
+        marker = self.root / name / ACTIVE
+        if marker.exists():
+            return marker.read_text(encoding="utf-8").strip()
+        versions = self.versions(name)
+        return versions[-1] if versions else None
+
+    def resolve(self, name: str, version: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Load a version's manifest
+
+        Args:
+            name: Model name
+            version: Pinned version (ACTIVE/newest if None)
+
+        Returns:
+            Manifest dict with an added "dir" entry
+
+        Raises:
+            ArtifactError: If the model or version is not registered
+        """
+        version = version or self.active_version(name)
+        if version is None:
+            raise ArtifactError(f"Model '{name}' is not registered in {self.root}")
+        manifest_path = self.root / name / version / MANIFEST
+        if not manifest_path.exists():
+            raise ArtifactError(f"Model '{name}' has no version '{version}' in {self.root}")
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        manifest["dir"] = str(manifest_path.parent)
+        return manifest
+
+    def path(self, manifest: Dict[str, Any], kind: str, verify: bool = True) -> Path:
+        """
+        Local path of one file in a resolved version
+
+        Args:
+            manifest: Output of resolve()
+            kind: File kind, e.g. "weights", "state", "onnx"
+            verify: Check size and SHA-256 against the manifest
+
+        Raises:
+            ArtifactError: If the kind is absent, missing on disk or corrupt
+        """
+        entry = manifest["files"].get(kind)
+        if entry is None:
+            raise ArtifactError(
+                f"{manifest['name']}@{manifest['version']} has no '{kind}' file "
+                f"(available: {', '.join(sorted(manifest['files'])) or 'none'})"
+            )
+        path = Path(manifest["dir"]) / entry["file"]
+        if not path.exists():
+            raise ArtifactError(f"Artifact file missing: {path}")
+        if verify:
+            if path.stat().st_size != entry["size"] or sha256_file(path) != entry["sha256"]:
+                raise ArtifactError(f"Checksum mismatch for {path}")
+        return path
+
+    def add(
+        self,
+        name: str,
+        version: str,
+        files: Dict[str, str],
+        metadata: Optional[Dict[str, Any]] = None,
+        activate: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Register files under name@version (merging into an existing version)
+
+        Args:
+            name: Model name
+            version: Version label
+            files: Kind -> source path; files are copied into the store
+            metadata: Extra manifest fields (merged)
+            activate: Mark this version ACTIVE
+
+        Returns:
+            Updated manifest
+        """
+        for label in (name, version):
+            if not _NAME_PATTERN.match(label):
+                raise ArtifactError(f"Invalid artifact name or version: {label!r}")
+
+        version_dir = self.root / name / version
+        version_dir.mkdir(parents=True, exist_ok=True)
+        manifest_path = version_dir / MANIFEST
+        if manifest_path.exists():
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        else:
+            manifest = {"name": name, "version": version, "created_at": time.time(), "files": {}, "metadata": {}}
+
+        for kind, source in files.items():
+            source = Path(source)
+            target = version_dir / source.name
+            if source.resolve() != target.resolve():
+                shutil.copyfile(source, target)
+            manifest["files"][kind] = {
+                "file": target.name,
+                "size": target.stat().st_size,
+                "sha256": sha256_file(target),
+            }
+        manifest["metadata"].update(metadata or {})
+
+        _write_atomic(manifest_path, json.dumps(manifest, indent=2))
+        if activate:
+            self.activate(name, version)
+        logger.info(f"Registered {name}@{version}: {', '.join(sorted(manifest['files']))}")
+        return manifest
+
+    def activate(self, name: str, version: str):
+        """Make version the default for name"""
+        if not (self.root / name / version / MANIFEST).exists():
+            raise ArtifactError(f"Model '{name}' has no version '{version}'")
+        _write_atomic(self.root / name / ACTIVE, version + "\n")
+
+    def verify(self, name: str, version: Optional[str] = None) -> List[str]:
+        """Check every file of a version; returns a list of problems (empty if OK)"""
+        manifest = self.resolve(name, version)
+        problems = []
+        for kind in manifest["files"]:
+            try:
+                self.path(manifest, kind, verify=True)
+            except ArtifactError as e:
+                problems.append(str(e))
+        return problems
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Summary of every registered model version"""
+        if not self.root.is_dir():
+            return []
+        entries = []
+        for model_dir in sorted(p for p in self.root.iterdir() if p.is_dir()):
+            active = self.active_version(model_dir.name)
+            for version in self.versions(model_dir.name):
+                manifest = self.resolve(model_dir.name, version)
+                entries.append({
+                    "name": model_dir.name,
+                    "version": version,
+                    "active": version == active,
+                    "files": {kind: entry["size"] for kind, entry in manifest["files"].items()},
+                })
+        return entries
+
+
+def _write_atomic(path: Path, text: str):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
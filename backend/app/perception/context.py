@@ -0,0 +1,85 @@
+"""Per-request image context shared by all pipeline stages"""
+import logging
+from typing import Dict, Tuple, Union
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class ImageContext:
+    """
+    Owns the single decoded pixel buffer for one request
+
+    Pixels are stored once as a contiguous, read-only uint8 BGR array (the
+    layout YOLO and OpenCV consume natively). Stages read numpy views of it
+    instead of making their own copies, and borrow float/gray scratch
+    buffers that are reused across detections.
+    """
+
+    def __init__(self, pixels: np.ndarray):
+        """
+        Args:
+            pixels: HxWx3 uint8 array in BGR order
+        """
+        if pixels.ndim != 3 or pixels.shape[2] != 3 or pixels.dtype != np.uint8:
+            raise ValueError(f"Expected HxWx3 uint8 pixels, got {pixels.shape} {pixels.dtype}")
+        self.pixels = np.ascontiguousarray(pixels)
+        self.pixels.flags.writeable = False
+        self._scratch: Dict[Tuple[str, np.dtype], np.ndarray] = {}
+
+    @classmethod
+    def from_image(cls, image: Image.Image) -> "ImageContext":
+        """Decode a PIL image straight into a BGR buffer (single allocation)"""
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        width, height = image.size
+        data = image.tobytes("raw", "BGR")
+        return cls(np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3))
+
+    @classmethod
+    def wrap(cls, image: Union[Image.Image, "ImageContext"]) -> "ImageContext":
+        """Return image unchanged if already a context, else decode it"""
+        if isinstance(image, ImageContext):
+            return image
+        return cls.from_image(image)
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """(width, height), matching PIL's Image.size"""
+        return self.pixels.shape[1], self.pixels.shape[0]
+
+    def crop(self, bbox: list = None) -> np.ndarray:
+        """
+        Zero-copy view of a bounding box region
+
+        Args:
+            bbox: Optional [x1, y1, x2, y2]; clamped to the image
+
+        Returns:
+            BGR view into the shared buffer
+        """
+        if not bbox:
+            return self.pixels
+        width, height = self.size
+        x1, y1, x2, y2 = [int(v) for v in bbox]
+        x1, x2 = max(0, min(x1, width)), max(0, min(x2, width))
+        y1, y2 = max(0, min(y1, height)), max(0, min(y2, height))
+        return self.pixels[y1:y2, x1:x2]
+
+    def scratch(self, name: str, shape: Tuple[int, ...], dtype=np.float32) -> np.ndarray:
+        """
+        Borrow a reusable work buffer
+
+        The backing storage only grows, so repeated calls across detections
+        allocate at most once per (name, dtype). Contents are undefined and
+        the view is invalidated by the next call with the same name.
+        """
+        dtype = np.dtype(dtype)
+        needed = int(np.prod(shape))
+        key = (name, dtype)
+        buf = self._scratch.get(key)
+        if buf is None or buf.size < needed:
+            buf = np.empty(needed, dtype=dtype)
+            self._scratch[key] = buf
+        return buf[:needed].reshape(shape)
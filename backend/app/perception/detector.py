@@ -1,45 +1,136 @@
 """YOLOv8-based ingredient detection"""
 import logging
-from typing import List, Dict, Any
+import os
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple, Union
 from pathlib import Path
 import numpy as np
 from PIL import Image
+
+# Never let ultralytics reach for the network (asset downloads, update checks)
+os.environ.setdefault("YOLO_OFFLINE", "true")
+
+import torch
+import yaml
+from torchvision.ops import batched_nms
 from ultralytics import YOLO
 
+from .artifacts import ArtifactError, ArtifactStore
+from .context import ImageContext
+
 logger = logging.getLogger(__name__)
 
 
 class IngredientDetector:
     """YOLOv8-based object detector for food items"""
     
-    def __init__(self, model_path: str = "yolov8n.pt"):
-        """Initialize detector with pretrained YOLOv8"""
+    def __init__(
+        self,
+        model_path: str = "yolov8n.pt",
+        store: Optional[ArtifactStore] = None,
+        version: Optional[str] = None,
+        artifact_kind: str = "state",
+        verify_checksums: bool = True
+    ):
+        """
+        Initialize detector with pretrained YOLOv8
+        
+        Args:
+            model_path: Local checkpoint, or a model name registered in the store
+            store: Artifact store searched first (by model_path's stem)
+            version: Pinned store version (ACTIVE if None)
+            artifact_kind: "state" (fast mmap load), "weights" or an export format
+            verify_checksums: Verify artifact SHA-256 before loading
+        """
         self.model = None
         self.model_path = model_path
+        self.store = store
+        self.version = version
+        self.artifact_kind = artifact_kind
+        self.verify_checksums = verify_checksums
+        self.model_version = Path(model_path).stem
         self._initialized = False
+        # Ultralytics models are not thread-safe: each call rewrites the shared
+        # predictor's args (imgsz, conf, max_det). Inference is serialized so
+        # scheduler slots only overlap the surrounding pipeline stages.
+        self._predict_lock = threading.Lock()
     
     def load(self):
-        """Load model once at startup"""
+        """Load model once at startup, from local files only"""
         if self._initialized:
             return
         
         try:
-            logger.info(f"Loading YOLOv8 model: {self.model_path}")
-            self.model = YOLO(self.model_path)
-            self.model.to('cpu')  # CPU-safe default
+            start = time.perf_counter()
+            name = Path(self.model_path).stem
+            if self.store is not None and self.store.has(name):
+                manifest = self.store.resolve(name, self.version)
+                path = self.store.path(manifest, self.artifact_kind, verify=self.verify_checksums)
+                verified = time.perf_counter()
+                self.model = self._load_artifact(manifest, path)
+                self.model_version = f"{name}@{manifest['version']}"
+                source = f"{self.artifact_kind} artifact {path} ({path.stat().st_size / 2**20:.1f}MB)"
+            elif Path(self.model_path).exists():
+                verified = start
+                self.model = YOLO(self.model_path)
+                self.model.to('cpu')  # CPU-safe default
+                source = f"local file {self.model_path}"
+            else:
+                # ultralytics would try to download it; startup must stay offline
+                raise ArtifactError(
+                    f"Model '{name}' is not in the artifact store and {self.model_path} does not exist; "
+                    f"register it with: python -m app.tools.models add {name}.pt --version <version>"
+                )
+            
+            elapsed = time.perf_counter() - start
             self._initialized = True
-            logger.info("YOLOv8 model loaded successfully")
+            logger.info(
+                f"Loaded {self.model_version} from {source} in {elapsed:.3f}s "
+                f"(checksum {verified - start:.3f}s)"
+            )
         except Exception as e:
             logger.error(f"Failed to load YOLOv8: {e}")
             raise
     
-    def detect(self, image: Image.Image, conf_threshold: float = 0.25) -> List[Dict[str, Any]]:
+    def _load_artifact(self, manifest: Dict[str, Any], path: Path) -> YOLO:
+        """Build a YOLO model from a store artifact of the configured kind"""
+        if self.artifact_kind == "weights":
+            model = YOLO(str(path), task="detect")
+            model.to('cpu')
+            return model
+        if self.artifact_kind != "state":
+            # Exported engine (onnx, openvino, ...), run through ultralytics' AutoBackend
+            return YOLO(str(path), task="detect")
+        
+        # Build the fused architecture, then adopt the memory-mapped tensors
+        # (assign=True) so every worker shares the same page-cache pages
+        config = self.store.path(manifest, "config", verify=self.verify_checksums)
+        model = YOLO(str(config), task="detect")
+        model.model.fuse(verbose=False)
+        state = torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+        model.model.load_state_dict(state, assign=True)
+        model.model.names = {int(k): v for k, v in manifest["metadata"]["names"].items()}
+        model.model.eval()
+        return model
+    
+    def detect(
+        self,
+        image: Union[Image.Image, ImageContext],
+        conf_threshold: float = 0.25,
+        imgsz: Optional[int] = None,
+        max_det: int = 300,
+        tiling: bool = False
+    ) -> List[Dict[str, Any]]:
         """
         Detect ingredients in image
         
         Args:
-            image: PIL Image
+            image: PIL Image or shared ImageContext (BGR buffer passed to YOLO as-is)
             conf_threshold: Confidence threshold
+            imgsz: Detector input size (YOLO default if None)
+            max_det: Max detections kept
+            tiling: Add overlapping tile passes for images larger than imgsz
             
         Returns:
             List of detections with bounding boxes
@@ -48,27 +139,12 @@ class IngredientDetector:
             self.load()
         
         try:
-            # Run inference
-            results = self.model(image, conf=conf_threshold, verbose=False)
-            
-            detections = []
-            for result in results:
-                boxes = result.boxes
-                for i in range(len(boxes)):
-                    box = boxes[i]
-                    class_id = int(box.cls[0])
-                    confidence = float(box.conf[0])
-                    xyxy = box.xyxy[0].cpu().numpy()
-                    
-                    # Map COCO classes to ingredient names (food-related only)
-                    ingredient_name = self._map_class_to_ingredient(class_id)
-                    if ingredient_name:
-                        detections.append({
-                            "name": ingredient_name,
-                            "confidence": confidence,
-                            "bbox": xyxy.tolist(),
-                            "class_id": class_id
-                        })
+            # Run inference (ndarray input is read as BGR without a conversion copy)
+            if tiling:
+                detections = self._predict_tiled(ImageContext.wrap(image), conf_threshold, imgsz or 640, max_det)
+            else:
+                source = image.pixels if isinstance(image, ImageContext) else image
+                detections = self._predict(source, conf_threshold, imgsz=imgsz, max_det=max_det)
             
             logger.info(f"Detected {len(detections)} ingredients")
             return detections
@@ -77,6 +153,161 @@ class IngredientDetector:
             logger.error(f"Detection failed: {e}")
             return []
     
+    def detect_cascade(
+        self,
+        image: Union[Image.Image, ImageContext],
+        conf_threshold: float = 0.25,
+        low_res: int = 320,
+        candidate_conf: float = 0.1,
+        accept_conf: float = 0.8,
+        region_padding: float = 0.25,
+        imgsz: Optional[int] = None,
+        max_det: int = 300,
+        tiling: bool = False
+    ) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Two-stage detection: cheap thumbnail pass gating full-resolution inference
+        
+        The low-res pass runs with a permissive threshold. If it sees no food
+        candidates, or only candidates above accept_conf, its result is final.
+        Otherwise the full-resolution pass runs on the padded region around
+        the uncertain candidates only (or the whole image if that region is
+        most of it). With tiling, an uncertain first pass falls back to the
+        full tiled pass instead, so tiling is only paid for when needed.
+        
+        Args:
+            image: PIL Image or shared ImageContext
+            conf_threshold: Final confidence threshold
+            low_res: Inference size for the first pass
+            candidate_conf: Threshold for first-pass candidates
+            accept_conf: Candidates at or above this need no refinement
+            region_padding: Fractional padding around the uncertain region
+            imgsz: Inference size for the refinement pass (YOLO default if None)
+            max_det: Max detections kept
+            tiling: Refine with the whole-image + tiles pass
+            
+        Returns:
+            (detections, stage) where stage is "empty", "confident" or "refined"
+        """
+        if not self._initialized:
+            self.load()
+        
+        try:
+            ctx = ImageContext.wrap(image)
+            candidates = self._predict(ctx.pixels, candidate_conf, imgsz=low_res, max_det=max_det)
+            
+            if not candidates:
+                return [], "empty"
+            
+            uncertain = [d for d in candidates if d["confidence"] < accept_conf]
+            if not uncertain:
+                return [d for d in candidates if d["confidence"] >= conf_threshold], "confident"
+            
+            if tiling:
+                return self._predict_tiled(ctx, conf_threshold, imgsz or 640, max_det), "refined"
+            
+            # Region around uncertain candidates, padded and clamped
+            width, height = ctx.size
+            x1 = min(d["bbox"][0] for d in uncertain)
+            y1 = min(d["bbox"][1] for d in uncertain)
+            x2 = max(d["bbox"][2] for d in uncertain)
+            y2 = max(d["bbox"][3] for d in uncertain)
+            pad_x, pad_y = (x2 - x1) * region_padding, (y2 - y1) * region_padding
+            region = [
+                max(0, int(x1 - pad_x)), max(0, int(y1 - pad_y)),
+                min(width, int(x2 + pad_x) + 1), min(height, int(y2 + pad_y) + 1)
+            ]
+            region_area = (region[2] - region[0]) * (region[3] - region[1])
+            
+            if region_area > 0.5 * width * height:
+                return self._predict(ctx.pixels, conf_threshold, imgsz=imgsz, max_det=max_det), "refined"
+            
+            refined = self._predict(
+                ctx.crop(region), conf_threshold, imgsz=imgsz, offset=(region[0], region[1]), max_det=max_det
+            )
+            
+            # Keep confident first-pass detections outside the refined region
+            kept = [
+                d for d in candidates
+                if d["confidence"] >= accept_conf and not _center_inside(d["bbox"], region)
+            ]
+            return kept + refined, "refined"
+            
+        except Exception as e:
+            logger.error(f"Cascade detection failed: {e}")
+            return [], "error"
+    
+    def _predict_tiled(
+        self,
+        ctx: ImageContext,
+        conf_threshold: float,
+        imgsz: int,
+        max_det: int,
+        overlap: float = 0.2,
+        max_tiles_per_axis: int = 4,
+        iou_threshold: float = 0.5
+    ) -> List[Dict[str, Any]]:
+        """
+        Whole-image pass plus overlapping tiles, merged with class-aware NMS
+        
+        Tiles are roughly imgsz wide so small items keep their native
+        resolution instead of being downscaled with the whole photo.
+        """
+        detections = self._predict(ctx.pixels, conf_threshold, imgsz=imgsz, max_det=max_det)
+        
+        width, height = ctx.size
+        xs, tile_w = _tile_grid(width, imgsz, overlap, max_tiles_per_axis)
+        ys, tile_h = _tile_grid(height, imgsz, overlap, max_tiles_per_axis)
+        if len(xs) == 1 and len(ys) == 1:
+            return detections
+        
+        for y in ys:
+            for x in xs:
+                region = [x, y, min(width, x + tile_w), min(height, y + tile_h)]
+                detections += self._predict(
+                    ctx.crop(region), conf_threshold, imgsz=imgsz, offset=(x, y), max_det=max_det
+                )
+        
+        if not detections:
+            return detections
+        boxes = torch.tensor([d["bbox"] for d in detections], dtype=torch.float32)
+        scores = torch.tensor([d["confidence"] for d in detections], dtype=torch.float32)
+        classes = torch.tensor([d["class_id"] for d in detections])
+        keep = batched_nms(boxes, scores, classes, iou_threshold)[:max_det]
+        return [detections[i] for i in keep.tolist()]
+    
+    def _predict(
+        self, source, conf_threshold: float, imgsz: int = None, offset=(0, 0), max_det: int = 300
+    ) -> List[Dict[str, Any]]:
+        """Run YOLO once and map food classes, shifting boxes by offset"""
+        kwargs = {"conf": conf_threshold, "max_det": max_det, "verbose": False}
+        if imgsz:
+            kwargs["imgsz"] = imgsz
+        with self._predict_lock:
+            results = self.model(source, **kwargs)
+        
+        dx, dy = offset
+        detections = []
+        for result in results:
+            boxes = result.boxes
+            for i in range(len(boxes)):
+                box = boxes[i]
+                class_id = int(box.cls[0])
+                confidence = float(box.conf[0])
+                xyxy = box.xyxy[0].cpu().numpy()
+                
+                # Map COCO classes to ingredient names (food-related only)
+                ingredient_name = self._map_class_to_ingredient(class_id)
+                if ingredient_name:
+                    x1, y1, x2, y2 = xyxy.tolist()
+                    detections.append({
+                        "name": ingredient_name,
+                        "confidence": confidence,
+                        "bbox": [x1 + dx, y1 + dy, x2 + dx, y2 + dy] if (dx or dy) else [x1, y1, x2, y2],
+                        "class_id": class_id
+                    })
+        return detections
+    
     def _map_class_to_ingredient(self, class_id: int) -> str:
         """Map COCO class IDs to ingredient names"""
         # COCO dataset food-related classes
@@ -95,14 +326,73 @@ class IngredientDetector:
         return food_classes.get(class_id, None)
 
 
+def _center_inside(bbox: list, region: list) -> bool:
+    """True if the bbox center falls inside region [x1, y1, x2, y2]"""
+    cx, cy = (bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2
+    return region[0] <= cx <= region[2] and region[1] <= cy <= region[3]
+
+
+def _tile_grid(length: int, tile: int, overlap: float, max_tiles: int) -> Tuple[List[int], int]:
+    """Evenly spaced tile origins and tile size covering length with overlap"""
+    if length <= tile:
+        return [0], length
+    count = min(max_tiles, int(np.ceil((length - tile * overlap) / (tile * (1 - overlap)))))
+    if count <= 1:
+        return [0], length
+    size = int(np.ceil(length / (count - (count - 1) * overlap)))
+    step = size * (1 - overlap)
+    return [int(round(i * step)) for i in range(count)], size
+
+
+def export_fast_state(weights_path: str, output_dir: str) -> Dict[str, Any]:
+    """
+    Convert a YOLO checkpoint into a fast-loading state dict plus config
+    
+    The checkpoint is a pickled module that every process unpickles into
+    private memory. The exported state is already fused (conv+bn) float32
+    tensors, which torch.load can memory-map, so workers share pages.
+    
+    Args:
+        weights_path: Local .pt checkpoint
+        output_dir: Directory for the generated files
+        
+    Returns:
+        {"files": {"state": path, "config": path}, "metadata": {...}}
+    """
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    stem = Path(weights_path).stem
+    
+    model = YOLO(weights_path).model.float().eval()
+    model.fuse(verbose=False)
+    
+    state_path = output / f"{stem}.state.pt"
+    config_path = output / f"{stem}.yaml"
+    torch.save({k: v.detach().contiguous() for k, v in model.state_dict().items()}, state_path)
+    config_path.write_text(yaml.safe_dump(model.yaml, sort_keys=False), encoding="utf-8")
+    
+    return {
+        "files": {"state": str(state_path), "config": str(config_path)},
+        "metadata": {"names": {str(k): v for k, v in model.names.items()}, "fused": True}
+    }
+
+
 # Singleton instance
 _detector_instance = None
 
 
 def get_detector() -> IngredientDetector:
-    """Get singleton detector instance"""
+    """Get singleton detector instance (loaded from the local artifact store)"""
     global _detector_instance
     if _detector_instance is None:
-        _detector_instance = IngredientDetector()
+        from app.config import get_settings
+        settings = get_settings()
+        _detector_instance = IngredientDetector(
+            model_path=settings.detector_model,
+            store=ArtifactStore(settings.model_store_dir),
+            version=settings.detector_model_version or None,
+            artifact_kind=settings.detector_artifact_kind,
+            verify_checksums=settings.verify_model_checksums
+        )
         _detector_instance.load()
     return _detector_instance
@@ -1,10 +1,12 @@
 """CNN-based freshness estimation using visual features"""
 import logging
-from typing import Dict
+from typing import Dict, Union
 import numpy as np
 from PIL import Image
 import cv2
-from skimage import color, feature
+from skimage import feature
+
+from .context import ImageContext
 
 logger = logging.getLogger(__name__)
 
@@ -22,39 +24,45 @@ class FreshnessEstimator:
         logger.info("Freshness estimator initialized")
         self._initialized = True
     
-    def estimate(self, image: Image.Image, bbox: list = None) -> Dict[str, float]:
+    def estimate(
+        self,
+        image: Union[Image.Image, ImageContext],
+        bbox: list = None,
+        mode: str = "full"
+    ) -> Dict[str, float]:
         """
         Estimate freshness score and expiry
         
         Args:
-            image: PIL Image
+            image: PIL Image or shared ImageContext
             bbox: Optional bounding box [x1, y1, x2, y2]
+            mode: "full" (color + texture), "color" (skips the LBP
+                texture pass) or "off" (neutral default, no analysis)
             
         Returns:
             Dict with freshness_score (0-1) and expires_in_days
         """
         if not self._initialized:
             self.load()
+        if mode == "off":
+            return {"freshness_score": 0.7, "expires_in_days": 3}
         
         try:
-            # Crop to bbox if provided
-            if bbox:
-                x1, y1, x2, y2 = [int(x) for x in bbox]
-                img = image.crop((x1, y1, x2, y2))
-            else:
-                img = image
-            
-            # Convert to numpy
-            img_array = np.array(img)
+            # Crop is a view into the shared buffer, not a copy
+            ctx = ImageContext.wrap(image)
+            img_array = ctx.crop(bbox)
             
             # Color-based freshness heuristics
-            color_score = self._analyze_color(img_array)
+            color_score = self._analyze_color(img_array, ctx)
             
-            # Texture-based analysis
-            texture_score = self._analyze_texture(img_array)
-            
-            # Combined score
-            freshness_score = 0.6 * color_score + 0.4 * texture_score
+            if mode == "color":
+                freshness_score = color_score
+            else:
+                # Texture-based analysis
+                texture_score = self._analyze_texture(img_array, ctx)
+                
+                # Combined score
+                freshness_score = 0.6 * color_score + 0.4 * texture_score
             
             # Estimate days to consume (heuristic)
             expires_in_days = int(freshness_score * 7)  # 0-7 days based on freshness
@@ -68,18 +76,21 @@ class FreshnessEstimator:
             logger.error(f"Freshness estimation failed: {e}")
             return {"freshness_score": 0.7, "expires_in_days": 3}  # Safe default
     
-    def _analyze_color(self, img: np.ndarray) -> float:
+    def _analyze_color(self, img: np.ndarray, ctx: ImageContext) -> float:
         """Analyze color vibrancy (higher = fresher)"""
         try:
             # Convert to LAB color space
             if len(img.shape) == 2:  # Grayscale
                 return 0.5
             
-            img_lab = color.rgb2lab(img / 255.0)
+            # Reuse float scratch buffers instead of allocating per detection
+            scaled = ctx.scratch("float", img.shape)
+            np.multiply(img, 1 / 255.0, out=scaled, casting="unsafe")
+            img_lab = cv2.cvtColor(scaled, cv2.COLOR_BGR2Lab, dst=ctx.scratch("lab", img.shape))
             
             # Higher L* and saturation indicate freshness
-            lightness = np.mean(img_lab[:, :, 0])
-            saturation = np.std(img_lab[:, :, 1:])
+            lightness = float(np.mean(img_lab[:, :, 0]))
+            saturation = float(np.std(img_lab[:, :, 1:]))
             
             # Normalize to 0-1
             score = min(1.0, (lightness / 100) * 0.5 + (saturation / 50) * 0.5)
@@ -88,12 +99,12 @@ class FreshnessEstimator:
         except Exception:
             return 0.7
     
-    def _analyze_texture(self, img: np.ndarray) -> float:
+    def _analyze_texture(self, img: np.ndarray, ctx: ImageContext) -> float:
         """Analyze texture smoothness (smoother = fresher)"""
         try:
             # Convert to grayscale
             if len(img.shape) == 3:
-                gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=ctx.scratch("gray", img.shape[:2], np.uint8))
             else:
                 gray = img
             
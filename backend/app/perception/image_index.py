@@ -0,0 +1,231 @@
+"""Perceptual-hash index for reusing results of near-duplicate uploads"""
+import copy
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 8
+_DCT_SIZE = 32
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """Orthonormal DCT-II basis (rows are frequencies)"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0, :] = np.sqrt(1.0 / n)
+    return m
+
+
+_DCT = _dct_matrix(_DCT_SIZE)
+
+
+def compute_phash(image: Image.Image) -> int:
+    """
+    Compute a 64-bit DCT perceptual hash
+
+    Robust to rescaling, mild re-framing and lighting changes, unlike
+    a byte-exact hash of the upload.
+
+    Args:
+        image: PIL Image
+
+    Returns:
+        64-bit hash as int
+    """
+    small = image.resize((_DCT_SIZE, _DCT_SIZE), Image.Resampling.BOX).convert("L")
+    pixels = np.asarray(small, dtype=np.float64)
+    freq = _DCT @ pixels @ _DCT.T
+    low = freq[:HASH_SIZE, :HASH_SIZE].flatten()
+    # Skip the DC term so overall brightness doesn't shift the median
+    bits = low > np.median(low[1:])
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes"""
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """Burkhard-Keller tree over hamming distance with lazy deletion"""
+
+    def __init__(self):
+        self._root = None  # [hash, key, {distance: child}]
+        self._removed = set()
+
+    def add(self, hash_value: int, key: str):
+        """Insert a hash under the given key"""
+        node = [hash_value, key, {}]
+        if self._root is None:
+            self._root = node
+            return
+        current = self._root
+        while True:
+            d = hamming_distance(hash_value, current[0])
+            child = current[2].get(d)
+            if child is None:
+                current[2][d] = node
+                return
+            current = child
+
+    def remove(self, key: str):
+        """Tombstone a key; it is skipped by search until rebuild"""
+        self._removed.add(key)
+
+    @property
+    def tombstones(self) -> int:
+        return len(self._removed)
+
+    def search(self, hash_value: int, max_distance: int) -> List[Tuple[int, str]]:
+        """Return (distance, key) pairs within max_distance, nearest first"""
+        matches = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            d = hamming_distance(hash_value, node[0])
+            if d <= max_distance and node[1] not in self._removed:
+                matches.append((d, node[1]))
+            # Triangle inequality prunes children outside [d - r, d + r]
+            for child_d, child in node[2].items():
+                if d - max_distance <= child_d <= d + max_distance:
+                    stack.append(child)
+        matches.sort()
+        return matches
+
+
+class NearDuplicateIndex:
+    """Bounded LRU index mapping perceptual hashes to pipeline results"""
+
+    def __init__(self, max_entries: int = 512, max_distance: int = 6):
+        """
+        Args:
+            max_entries: Max remembered images (oldest evicted first)
+            max_distance: Max hamming distance treated as the same photo
+        """
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._tree = BKTree()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, hash_value: int, image_size: Tuple[int, int], variant: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Find a stored result for a near-duplicate image
+
+        Args:
+            hash_value: Hash from compute_phash()
+            image_size: (width, height) of the new image
+            variant: Only match results stored under the same variant
+                (e.g. performance tier)
+
+        Returns:
+            Copy of stored result with boxes rescaled and match distance
+            recorded in metadata, or None if nothing is close enough
+        """
+        with self._lock:
+            matches = [
+                (distance, key) for distance, key in self._tree.search(hash_value, self.max_distance)
+                if self._entries[key]["variant"] == variant
+            ]
+            if not matches:
+                return None
+            distance, key = matches[0]
+            entry = self._entries[key]
+            self._entries.move_to_end(key)
+
+        result = rescale_result(entry["result"], entry["size"], image_size)
+        metadata = result.setdefault("metadata", {})
+        metadata["near_duplicate"] = {
+            "distance": distance,
+            "max_distance": self.max_distance,
+            "source_size": list(entry["size"]),
+        }
+        return result
+
+    def add(self, hash_value: int, image_size: Tuple[int, int], result: Dict[str, Any], variant: str = ""):
+        """Remember a result (under a variant), evicting least recently used entries"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            key = str(self._next_id)
+            self._next_id += 1
+            self._entries[key] = {
+                "hash": hash_value,
+                "size": tuple(image_size),
+                "variant": variant,
+                "result": copy.deepcopy(result),
+            }
+            self._tree.add(hash_value, key)
+
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._tree.remove(old_key)
+
+            # Rebuild once dead nodes outnumber live ones to keep memory bounded
+            if self._tree.tombstones > len(self._entries):
+                self._rebuild()
+
+    def _rebuild(self):
+        tree = BKTree()
+        for key, entry in self._entries.items():
+            tree.add(entry["hash"], key)
+        self._tree = tree
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def rescale_result(result: Dict[str, Any], from_size: Tuple[int, int], to_size: Tuple[int, int]) -> Dict[str, Any]:
+    """
+    Deep-copy a pipeline result, scaling bounding boxes to a new image size
+
+    Args:
+        result: Pipeline output with inventory[].boundingBox
+        from_size: (width, height) the boxes were computed on
+        to_size: (width, height) of the target image
+
+    Returns:
+        New result dict
+    """
+    result = copy.deepcopy(result)
+    sx = to_size[0] / from_size[0] if from_size[0] else 1.0
+    sy = to_size[1] / from_size[1] if from_size[1] else 1.0
+    if sx == 1.0 and sy == 1.0:
+        return result
+
+    for item in result.get("inventory", []):
+        box = item.get("boundingBox")
+        if box and len(box) == 4:
+            x1, y1, x2, y2 = box
+            item["boundingBox"] = [
+                round(x1 * sx, 1), round(y1 * sy, 1),
+                round(x2 * sx, 1), round(y2 * sy, 1),
+            ]
+    return result
+
+
+# Singleton instance
+_index_instance = None
+
+
+def get_near_duplicate_index() -> NearDuplicateIndex:
+    """Get singleton index configured from settings"""
+    global _index_instance
+    if _index_instance is None:
+        from app.config import get_settings
+        settings = get_settings()
+        _index_instance = NearDuplicateIndex(
+            max_entries=settings.near_duplicate_index_size,
+            max_distance=settings.near_duplicate_max_distance,
+        )
+    return _index_instance
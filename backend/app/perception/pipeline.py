@@ -1,14 +1,20 @@
 """Main perception pipeline orchestrator"""
 import logging
 import time
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Union
 from PIL import Image
 import asyncio
 from concurrent.futures import ThreadPoolExecutor, TimeoutError
 
+from app.metrics import get_metrics
+from .context import ImageContext
 from .detector import get_detector
 from .freshness import get_freshness_estimator
 from .volume import get_volume_estimator
+from .image_index import compute_phash, get_near_duplicate_index
+from .profiling import SamplingProfiler, save_profile
+from .simulator import PipelineSimulator
+from .tiers import DEFAULT_TIER, PERFORMANCE_TIERS, resolve_tier
 
 logger = logging.getLogger(__name__)
 
@@ -16,8 +22,15 @@ logger = logging.getLogger(__name__)
 class PerceptionPipeline:
     """Orchestrates ML inference pipeline"""
     
-    def __init__(self, timeout: float = 2.0):
+    def __init__(self, timeout: float = 2.0, cascade_options: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            timeout: Max inference time in seconds
+            cascade_options: Keyword arguments for detect_cascade();
+                None runs the single full-resolution pass
+        """
         self.timeout = timeout
+        self.cascade_options = cascade_options
         self.detector = None
         self.freshness = None
         self.volume = None
@@ -44,12 +57,16 @@ class PerceptionPipeline:
             logger.error(f"Pipeline initialization failed: {e}")
             raise
     
-    def run(self, image: Image.Image) -> Dict[str, Any]:
+    def run(self, image: Union[Image.Image, ImageContext], tier: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Run full perception pipeline on image
         
+        The image is decoded once into an ImageContext; every stage reads
+        views of that buffer rather than copying it.
+        
         Args:
-            image: PIL Image
+            image: PIL Image or pre-built ImageContext
+            tier: Performance tier options from resolve_tier() (balanced if None)
             
         Returns:
             Structured ingredient data for Gemini adapter
@@ -57,30 +74,53 @@ class PerceptionPipeline:
         if not self._initialized:
             self.initialize()
         
+        tier = tier or {"name": DEFAULT_TIER, **PERFORMANCE_TIERS[DEFAULT_TIER]}
         start = time.time()
         
         try:
+            ctx = ImageContext.wrap(image)
+            metrics = get_metrics()
+            
             # Step 1: Detect ingredients
-            detections = self.detector.detect(image, conf_threshold=0.3)
+            stage_start = time.perf_counter()
+            cascade_stage = None
+            detect_options = {
+                "conf_threshold": tier["conf_threshold"],
+                "imgsz": tier["imgsz"],
+                "max_det": tier["max_det"]
+            }
+            if self.cascade_options is not None:
+                # The low-res gate matters most in front of the tiled pass
+                detections, cascade_stage = self.detector.detect_cascade(
+                    ctx, tiling=tier["tiling"], **detect_options, **self.cascade_options
+                )
+                get_metrics().increment("detector_cascade_exit", stage=cascade_stage)
+            else:
+                detections = self.detector.detect(ctx, tiling=tier["tiling"], **detect_options)
+            stage_times = {"detect": time.perf_counter() - stage_start, "freshness": 0.0, "volume": 0.0}
+            metrics.observe("pipeline_stage_seconds", stage_times["detect"], stage="detect", tier=tier["name"])
             
             if not detections:
                 logger.warning("No ingredients detected")
-                return {"ingredients": []}
             
             # Step 2: Enrich with freshness and volume
             ingredients = []
-            img_size = image.size  # (width, height)
+            img_size = ctx.size  # (width, height)
             
             for det in detections:
                 # Freshness estimation
-                fresh_data = self.freshness.estimate(image, det["bbox"])
+                stage_start = time.perf_counter()
+                fresh_data = self.freshness.estimate(ctx, det["bbox"], mode=tier["freshness"])
+                stage_times["freshness"] += time.perf_counter() - stage_start
                 
                 # Volume estimation
+                stage_start = time.perf_counter()
                 volume_data = self.volume.estimate(
                     det["name"], 
                     det["bbox"], 
                     img_size
                 )
+                stage_times["volume"] += time.perf_counter() - stage_start
                 
                 # Combine into structured format
                 ingredient = {
@@ -99,14 +139,22 @@ class PerceptionPipeline:
             
             elapsed = time.time() - start
             logger.info(f"Pipeline completed in {elapsed:.2f}s - {len(ingredients)} ingredients")
+            metrics.observe("pipeline_stage_seconds", stage_times["freshness"], stage="freshness", tier=tier["name"])
+            metrics.observe("pipeline_stage_seconds", stage_times["volume"], stage="volume", tier=tier["name"])
+            
+            metadata = {
+                "inference_time": round(elapsed, 3),
+                "model_version": self.detector.model_version,
+                "tier": tier["name"],
+                "detections_count": len(ingredients),
+                "stage_times": {stage: round(t, 4) for stage, t in stage_times.items()}
+            }
+            if cascade_stage:
+                metadata["cascade_stage"] = cascade_stage
             
             return {
                 "inventory": ingredients,
-                "metadata": {
-                    "inference_time": round(elapsed, 3),
-                    "model_version": "yolov8n",
-                    "detections_count": len(ingredients)
-                }
+                "metadata": metadata
             }
             
         except Exception as e:
@@ -119,33 +167,138 @@ _pipeline_instance = None
 
 
 def get_pipeline(timeout: float = 2.0) -> PerceptionPipeline:
-    """Get singleton pipeline instance"""
+    """Get singleton pipeline instance (a PipelineSimulator in mock mode)"""
     global _pipeline_instance
     if _pipeline_instance is None:
-        _pipeline_instance = PerceptionPipeline(timeout=timeout)
+        from app.config import get_settings
+        settings = get_settings()
+        if settings.mock_mode:
+            _pipeline_instance = PipelineSimulator(
+                seed=settings.mock_seed,
+                detections_mean=settings.mock_detections_mean,
+                max_detections=settings.mock_max_detections,
+                latency_mode=settings.mock_latency_mode,
+                detect_latency=settings.mock_detect_latency,
+                freshness_latency=settings.mock_freshness_latency,
+                latency_sigma=settings.mock_latency_sigma,
+                replay_file=settings.mock_replay_file or None
+            )
+            _pipeline_instance.initialize()
+            return _pipeline_instance
+        
+        cascade_options = None
+        if settings.detection_cascade:
+            cascade_options = {
+                "low_res": settings.cascade_low_res,
+                "candidate_conf": settings.cascade_candidate_conf,
+                "accept_conf": settings.cascade_accept_conf
+            }
+        _pipeline_instance = PerceptionPipeline(timeout=timeout, cascade_options=cascade_options)
         _pipeline_instance.initialize()
     return _pipeline_instance
 
 
-def run_perception_pipeline(image: Image.Image, timeout: float = 2.0) -> Dict[str, Any]:
+def run_perception_pipeline(
+    image: Image.Image,
+    timeout: Optional[float] = None,
+    reuse_near_duplicates: bool = False,
+    profile: bool = False,
+    tier: Optional[str] = None,
+    cache_scope: str = "",
+    inline: bool = False
+) -> Dict[str, Any]:
     """
     Main entry point for perception pipeline
     
     Args:
         image: PIL Image
-        timeout: Max inference time in seconds
+        timeout: Max inference time in seconds (the tier's budget if None)
+        reuse_near_duplicates: Serve re-photographed images from the
+            perceptual-hash index instead of re-running inference
+        profile: Capture a sampling profile of this run and return its
+            ID in metadata.profile
+        tier: Performance tier name ("fast", "balanced", "accurate";
+            DEFAULT_TIER setting if None)
+        cache_scope: Caller identity; near-duplicates are only reused
+            within the same scope, never across clients
+        inline: Run in the calling thread and leave the deadline to the
+            caller (the scheduler keeps its slot until the run really ends)
         
     Returns:
         Structured ingredient data
+        
+    Raises:
+        ValueError: For unknown tier names
     """
+    tier_options = resolve_tier(tier)
+    if timeout is None:
+        timeout = tier_options["timeout"]
+    
+    if reuse_near_duplicates:
+        # Results differ per tier and belong to one caller, so both are
+        # part of the cache key
+        index = get_near_duplicate_index()
+        image_hash = compute_phash(image)
+        variant = f"{cache_scope}:{tier_options['name']}"
+        reused = index.lookup(image_hash, image.size, variant=variant)
+        if reused is not None:
+            # A profile describes the original run, not this lookup
+            reused["metadata"].pop("profile", None)
+            distance = reused["metadata"]["near_duplicate"]["distance"]
+            logger.info(f"Reusing near-duplicate result (hamming distance {distance})")
+            return reused
+        
+        result = _run_with_timeout(image, timeout, profile, tier_options, inline)
+        index.add(image_hash, image.size, result, variant=variant)
+        return result
+    
+    return _run_with_timeout(image, timeout, profile, tier_options, inline)
+
+
+def _run_profiled(pipeline: PerceptionPipeline, image: Image.Image, tier: Dict[str, Any]) -> Dict[str, Any]:
+    """Run the pipeline under the sampling profiler and attach the profile ID"""
+    from app.config import get_settings
+    settings = get_settings()
+    
+    with SamplingProfiler(interval=settings.profiling_interval) as profiler:
+        result = pipeline.run(image, tier)
+    
+    profile_id = save_profile(profiler, settings.profiling_dir, keep=settings.profiling_keep)
+    result.setdefault("metadata", {})["profile"] = {
+        "id": profile_id,
+        "samples": profiler.samples,
+        "breakdown": profiler.breakdown()
+    }
+    return result
+
+
+def _run_with_timeout(
+    image: Image.Image,
+    timeout: float,
+    profile: bool = False,
+    tier: Optional[Dict[str, Any]] = None,
+    inline: bool = False
+) -> Dict[str, Any]:
+    """Run the singleton pipeline, in a worker thread with a deadline unless inline"""
     pipeline = get_pipeline(timeout)
+    if inline:
+        return _run_profiled(pipeline, image, tier) if profile else pipeline.run(image, tier)
     
-    # Run with timeout protection
-    with ThreadPoolExecutor(max_workers=1) as executor:
-        future = executor.submit(pipeline.run, image)
+    # Run with timeout protection; don't wait for an overrunning call on the
+    # way out, or the deadline would only be reported once it finished. The
+    # overrun keeps running, but the detector serializes model calls, so it
+    # cannot interleave with the next request's inference.
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        if profile:
+            future = executor.submit(_run_profiled, pipeline, image, tier)
+        else:
+            future = executor.submit(pipeline.run, image, tier)
         try:
             result = future.result(timeout=timeout)
             return result
         except TimeoutError:
             logger.error(f"Pipeline timeout after {timeout}s")
             raise TimeoutError(f"ML inference exceeded {timeout}s timeout")
+    finally:
+        executor.shutdown(wait=False)
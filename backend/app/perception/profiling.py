@@ -0,0 +1,130 @@
+"""Low-overhead sampling profiler for individual pipeline runs"""
+import logging
+import sys
+import threading
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Top-level packages reported separately in the per-profile breakdown
+TRACKED_PACKAGES = ("torch", "torchvision", "ultralytics", "skimage", "cv2", "PIL", "numpy", "scipy")
+APP_PACKAGES = ("app", "main")
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stack of the calling thread from a background thread
+
+    Cost is one stack walk per interval rather than a hook on every call, so
+    it can wrap production requests. Output is collapsed stacks
+    ("frame;frame;frame count"), readable by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.leaf_packages: Counter = Counter()
+        self.samples = 0
+        self._target_ident: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "SamplingProfiler":
+        self._target_ident = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name="pipeline-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target_ident)
+            if frame is None:
+                continue
+
+            names = []
+            leaf_package = None
+            while frame is not None:
+                module = frame.f_globals.get("__name__", "?")
+                if leaf_package is None:
+                    leaf_package = _classify(module)
+                names.append(f"{frame.f_code.co_name} ({module}:{frame.f_code.co_firstlineno})")
+                frame = frame.f_back
+
+            self.stacks[";".join(reversed(names))] += 1
+            self.leaf_packages[leaf_package] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Collapsed-stack text, one stack per line"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+    def breakdown(self) -> Dict[str, float]:
+        """Fraction of samples whose innermost frame is in each package"""
+        if not self.samples:
+            return {}
+        return {
+            package: round(count / self.samples, 3)
+            for package, count in self.leaf_packages.most_common()
+        }
+
+
+def _classify(module: str) -> str:
+    """Map a module name to the package bucket used in the breakdown"""
+    top = module.split(".", 1)[0]
+    if top in TRACKED_PACKAGES:
+        return top
+    if top in APP_PACKAGES:
+        return "app"
+    return "other"
+
+
+def save_profile(profiler: SamplingProfiler, directory: str, keep: int = 200) -> str:
+    """
+    Write collapsed stacks to <directory>/<profile_id>.folded
+
+    Args:
+        profiler: Finished profiler
+        directory: Output directory (created if missing)
+        keep: Max profiles retained; the oldest are deleted (0 keeps all)
+
+    Returns:
+        Profile ID
+    """
+    profile_id = uuid.uuid4().hex[:16]
+    path = Path(directory)
+    path.mkdir(parents=True, exist_ok=True)
+    (path / f"{profile_id}.folded").write_text(profiler.collapsed(), encoding="utf-8")
+    logger.info(f"Saved profile {profile_id} ({profiler.samples} samples)")
+    if keep > 0:
+        _prune_profiles(path, keep)
+    return profile_id
+
+
+def _prune_profiles(directory: Path, keep: int):
+    """Delete the oldest profiles beyond the retention cap"""
+    profiles = []
+    for file in directory.glob("*.folded"):
+        try:
+            profiles.append((file.stat().st_mtime_ns, file))
+        except FileNotFoundError:
+            continue  # Pruned concurrently by another worker
+    profiles.sort()
+    for _, file in profiles[:-keep]:
+        file.unlink(missing_ok=True)
+
+
+def get_profile_path(profile_id: str, directory: str) -> Optional[Path]:
+    """Resolve a stored profile, rejecting anything but a plain hex ID"""
+    if not profile_id.isalnum():
+        return None
+    path = Path(directory) / f"{profile_id}.folded"
+    return path if path.is_file() else None
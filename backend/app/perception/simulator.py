@@ -0,0 +1,240 @@
+"""Simulated perception backend for mock mode, load tests and CI"""
+import json
+import logging
+import math
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Union
+import numpy as np
+from PIL import Image
+
+from app.metrics import get_metrics
+from .context import ImageContext
+from .tiers import DEFAULT_TIER, PERFORMANCE_TIERS
+from .volume import VolumeEstimator
+
+logger = logging.getLogger(__name__)
+
+# COCO food classes the real detector can emit
+SIMULATED_CLASSES = [
+    "banana", "apple", "sandwich", "orange", "broccoli",
+    "carrot", "hot_dog", "pizza", "donut", "cake",
+]
+
+LATENCY_MODES = ("none", "sleep", "cpu", "replay")
+
+
+class PipelineSimulator:
+    """
+    Drop-in stand-in for PerceptionPipeline that never loads a model
+
+    Detection counts and fields are drawn from configurable distributions,
+    and each stage spends a realistic amount of time either sleeping
+    (like torch, which releases the GIL), burning CPU while holding the GIL
+    (like pure-Python/skimage work), or replaying recorded latencies. Output
+    for a given image is a pure function of (seed, image content), so runs
+    are deterministic regardless of request interleaving.
+    """
+
+    def __init__(
+        self,
+        seed: int = 0,
+        detections_mean: float = 3.0,
+        max_detections: int = 12,
+        latency_mode: str = "sleep",
+        detect_latency: float = 0.18,
+        freshness_latency: float = 0.025,
+        latency_sigma: float = 0.35,
+        replay_file: Optional[str] = None,
+    ):
+        """
+        Args:
+            seed: Base seed; combined with image content per request
+            detections_mean: Poisson mean of detections per image
+            max_detections: Upper bound on detections per image
+            latency_mode: "none", "sleep", "cpu" or "replay"
+            detect_latency: Median detection latency in seconds
+            freshness_latency: Median freshness latency per detection
+            latency_sigma: Log-normal spread of sampled latencies
+            replay_file: Recorded latencies for "replay" mode
+        """
+        if latency_mode not in LATENCY_MODES:
+            raise ValueError(f"latency_mode must be one of {LATENCY_MODES}")
+        self.seed = seed
+        self.detections_mean = detections_mean
+        self.max_detections = max_detections
+        self.latency_mode = latency_mode
+        self.detect_latency = detect_latency
+        self.freshness_latency = freshness_latency
+        self.latency_sigma = latency_sigma
+        self.replay: Dict[str, List[float]] = {}
+        self.volume = VolumeEstimator()
+        self._initialized = False
+
+        if latency_mode == "replay":
+            if not replay_file:
+                raise ValueError("replay mode requires replay_file")
+            self.replay = load_replay(replay_file)
+
+    def initialize(self):
+        """Nothing to load; kept for PerceptionPipeline compatibility"""
+        if not self._initialized:
+            logger.info(f"Pipeline simulator ready (latency_mode={self.latency_mode}, seed={self.seed})")
+            self._initialized = True
+
+    def run(self, image: Union[Image.Image, ImageContext], tier: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Produce a pipeline-shaped result with simulated stage latencies
+
+        Tiers scale the simulated cost: detection with input area and
+        tile passes, freshness with the feature mode.
+        """
+        tier = tier or {"name": DEFAULT_TIER, **PERFORMANCE_TIERS[DEFAULT_TIER]}
+        start = time.time()
+        size = image.size
+        rng = np.random.default_rng([self.seed, _content_digest(image)])
+        metrics = get_metrics()
+
+        # Step 1: "Detect"
+        detect_time = self._spend(rng, "detect", self.detect_latency, _detect_cost(tier, size))
+        metrics.observe("pipeline_stage_seconds", detect_time, stage="detect", tier=tier["name"])
+        count = min(self.max_detections, tier["max_det"], int(rng.poisson(self.detections_mean)))
+        if count == 0:
+            logger.warning("No ingredients detected")
+
+        # Step 2: Enrich with freshness and volume
+        ingredients = []
+        freshness_time = 0.0
+        width, height = size
+        for _ in range(count):
+            name = SIMULATED_CLASSES[int(rng.integers(len(SIMULATED_CLASSES)))]
+            bbox = _sample_bbox(rng, width, height)
+            confidence = float(rng.beta(8, 2))
+            freshness_score = round(float(rng.beta(5, 2)), 2)
+            freshness_time += self._spend(
+                rng, "freshness", self.freshness_latency, _FRESHNESS_COST[tier["freshness"]]
+            )
+            volume_data = self.volume.estimate(name, bbox, size)
+
+            ingredients.append({
+                "name": name,
+                "quantity": f"{volume_data['quantity_grams']}g",
+                "confidence": round(confidence * 100, 1),
+                "freshness": round(freshness_score * 100, 1),
+                "category": "produce",
+                "scientificName": name.capitalize(),
+                "estimatedMass": f"{volume_data['quantity_grams']}g",
+                "boundingBox": bbox,
+                "daysToConsume": max(1, int(freshness_score * 7))
+            })
+        metrics.observe("pipeline_stage_seconds", freshness_time, stage="freshness", tier=tier["name"])
+
+        elapsed = time.time() - start
+        return {
+            "inventory": ingredients,
+            "metadata": {
+                "inference_time": round(elapsed, 3),
+                "model_version": "simulator",
+                "tier": tier["name"],
+                "detections_count": len(ingredients),
+                "stage_times": {
+                    "detect": round(detect_time, 4),
+                    "freshness": round(freshness_time, 4),
+                    "volume": 0.0
+                }
+            }
+        }
+
+    def _spend(self, rng: np.random.Generator, stage: str, median: float, scale: float = 1.0) -> float:
+        """
+        Sample a stage latency and spend it according to latency_mode
+
+        Args:
+            rng: Per-request generator
+            stage: "detect" or "freshness"
+            median: Median latency at the default tier
+            scale: Tier cost relative to the default tier; also applied to
+                replayed samples, which are recorded at the default tier
+        """
+        if self.latency_mode == "none" or median * scale <= 0:
+            return 0.0
+        if self.latency_mode == "replay" and self.replay.get(stage):
+            samples = self.replay[stage]
+            duration = samples[int(rng.integers(len(samples)))] * scale
+        else:
+            duration = float(median * scale * rng.lognormal(0.0, self.latency_sigma))
+
+        if self.latency_mode == "cpu":
+            deadline = time.perf_counter() + duration
+            while time.perf_counter() < deadline:
+                pass
+        else:
+            time.sleep(duration)
+        return duration
+
+
+# Relative freshness cost per feature mode (LBP texture dominates "full")
+_FRESHNESS_COST = {"full": 1.0, "color": 0.3, "off": 0.0}
+
+
+def _detect_cost(tier: Dict[str, Any], size) -> float:
+    """Detection cost relative to one 640px pass (scales with input area)"""
+    passes = 1
+    if tier["tiling"]:
+        width, height = size
+        tiles = min(4, math.ceil(width / tier["imgsz"])) * min(4, math.ceil(height / tier["imgsz"]))
+        passes += tiles if tiles > 1 else 0
+    return passes * (tier["imgsz"] / 640) ** 2
+
+
+def _content_digest(image: Union[Image.Image, ImageContext]) -> int:
+    """Cheap content fingerprint so identical images simulate identically"""
+    if isinstance(image, ImageContext):
+        thumb = image.pixels[::max(1, image.pixels.shape[0] // 16), ::max(1, image.pixels.shape[1] // 16)]
+        return zlib.crc32(np.ascontiguousarray(thumb).tobytes())
+    return zlib.crc32(image.resize((16, 16), Image.Resampling.NEAREST).tobytes())
+
+
+def _sample_bbox(rng: np.random.Generator, width: int, height: int) -> List[float]:
+    """Random box covering roughly 2-25% of the image"""
+    area_ratio = rng.uniform(0.02, 0.25)
+    aspect = rng.uniform(0.6, 1.6)
+    bw = min(width, np.sqrt(area_ratio * width * height * aspect))
+    bh = min(height, np.sqrt(area_ratio * width * height / aspect))
+    x1 = rng.uniform(0, max(1.0, width - bw))
+    y1 = rng.uniform(0, max(1.0, height - bh))
+    return [round(float(x1), 1), round(float(y1), 1), round(float(x1 + bw), 1), round(float(y1 + bh), 1)]
+
+
+def load_replay(path: str) -> Dict[str, List[float]]:
+    """
+    Load recorded stage latencies
+
+    Accepts either a JSON object of {"detect": [...], "freshness": [...]}
+    (seconds; freshness per detection) or a JSONL file of pipeline results,
+    e.g. app.tools.bulk output, whose metadata.stage_times are used.
+    """
+    text = Path(path).read_text(encoding="utf-8")
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            return {stage: [float(v) for v in values] for stage, values in data.items()}
+    except json.JSONDecodeError:
+        pass
+
+    replay: Dict[str, List[float]] = {"detect": [], "freshness": []}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        result = record.get("result", record)
+        metadata = (result or {}).get("metadata", {})
+        times = metadata.get("stage_times")
+        if not times:
+            continue
+        replay["detect"].append(times["detect"])
+        count = metadata.get("detections_count") or 0
+        if count:
+            replay["freshness"].append(times["freshness"] / count)
+    return replay
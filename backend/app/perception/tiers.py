@@ -0,0 +1,43 @@
+"""Named performance tiers trading accuracy for latency per request"""
+from typing import Dict, Any, Optional
+
+# imgsz: detector input size; max_det: detection cap;
+# freshness: "full" (color + texture), "color" (skips LBP) or "off";
+# tiling: extra overlapping full-resolution tile passes for small items
+PERFORMANCE_TIERS: Dict[str, Dict[str, Any]] = {
+    "fast": {"imgsz": 320, "max_det": 20, "conf_threshold": 0.35, "freshness": "color", "tiling": False},
+    "balanced": {"imgsz": 640, "max_det": 300, "conf_threshold": 0.3, "freshness": "full", "tiling": False},
+    "accurate": {"imgsz": 1280, "max_det": 300, "conf_threshold": 0.25, "freshness": "full", "tiling": True},
+}
+
+DEFAULT_TIER = "balanced"
+
+
+def resolve_tier(name: Optional[str] = None, settings=None) -> Dict[str, Any]:
+    """
+    Look up a tier and attach its timeout budget
+
+    Args:
+        name: Tier name (DEFAULT_TIER if None/empty)
+        settings: Settings providing per-tier timeouts (loaded if None)
+
+    Returns:
+        Tier options including "name" and "timeout"
+
+    Raises:
+        ValueError: For unknown tier names
+    """
+    if settings is None:
+        from app.config import get_settings
+        settings = get_settings()
+
+    name = (name or settings.default_tier or DEFAULT_TIER).lower()
+    if name not in PERFORMANCE_TIERS:
+        raise ValueError(f"Unknown tier '{name}' (expected one of: {', '.join(PERFORMANCE_TIERS)})")
+
+    timeouts = {
+        "fast": settings.tier_fast_timeout,
+        "balanced": settings.ml_inference_timeout,
+        "accurate": settings.tier_accurate_timeout,
+    }
+    return {"name": name, "timeout": timeouts[name], **PERFORMANCE_TIERS[name]}
@@ -0,0 +1,193 @@
+"""CPU topology discovery and per-process thread/affinity limits"""
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Native thread pools sized by environment variables at import time
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+# Held for the life of the process so sibling workers see the slot as taken
+_slot_lock_file = None
+_worker_slot = -1
+
+
+def available_cpus() -> List[int]:
+    """Logical CPUs this process may run on"""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def physical_cores(cpus: Optional[List[int]] = None) -> List[List[int]]:
+    """
+    Group logical CPUs by physical core (SMT siblings together)
+
+    Falls back to one core per logical CPU when sysfs topology is missing.
+
+    Args:
+        cpus: Logical CPUs to consider (default: available_cpus())
+
+    Returns:
+        List of cores, each a sorted list of logical CPU ids
+    """
+    cpus = cpus if cpus is not None else available_cpus()
+    cores: Dict[tuple, List[int]] = {}
+    for cpu in cpus:
+        topology = Path(f"/sys/devices/system/cpu/cpu{cpu}/topology")
+        try:
+            package = (topology / "physical_package_id").read_text().strip()
+            core = (topology / "core_id").read_text().strip()
+            key = (package, core)
+        except OSError:
+            key = ("cpu", str(cpu))
+        cores.setdefault(key, []).append(cpu)
+    return sorted((sorted(group) for group in cores.values()), key=lambda group: group[0])
+
+
+def partition_cpus(workers: int, cpus: Optional[List[int]] = None) -> List[List[int]]:
+    """
+    Split CPUs into one disjoint set per worker along physical-core lines
+
+    Args:
+        workers: Number of worker processes
+        cpus: Logical CPUs to split (default: available_cpus())
+
+    Returns:
+        List of CPU sets, one per worker
+    """
+    cores = physical_cores(cpus)
+    workers = max(1, min(workers, len(cores)))
+    slots: List[List[int]] = [[] for _ in range(workers)]
+    for i, core in enumerate(cores):
+        slots[i % workers].extend(core)
+    return [sorted(slot) for slot in slots]
+
+
+def configure_thread_environment(settings) -> None:
+    """
+    Export thread-count variables read by OpenMP/BLAS at import time
+
+    Must run before torch/numpy/cv2 are imported. Values already set in the
+    environment win, so operators can still override per deployment.
+    """
+    threads = settings.torch_intra_op_threads
+    if threads > 0:
+        for var in THREAD_ENV_VARS:
+            os.environ.setdefault(var, str(threads))
+
+
+def apply_thread_limits(
+    intra_op: int = 0,
+    inter_op: int = 0,
+    cv2_threads: int = 0,
+    cpus: Optional[List[int]] = None,
+) -> Dict[str, object]:
+    """
+    Apply thread pool sizes and CPU affinity to the current process
+
+    A value of 0 leaves the corresponding library default untouched.
+
+    Args:
+        intra_op: torch intra-op threads
+        inter_op: torch inter-op threads (only settable before first use)
+        cv2_threads: OpenCV worker threads
+        cpus: Logical CPUs to pin this process to
+
+    Returns:
+        Effective configuration, for logging
+    """
+    applied: Dict[str, object] = {}
+
+    if cpus:
+        try:
+            os.sched_setaffinity(0, cpus)
+            applied["cpus"] = cpus
+        except (AttributeError, OSError) as e:
+            logger.warning(f"Could not set CPU affinity: {e}")
+
+    if intra_op > 0 or inter_op > 0:
+        import torch
+        if intra_op > 0:
+            torch.set_num_threads(intra_op)
+        if inter_op > 0:
+            try:
+                torch.set_num_interop_threads(inter_op)
+            except RuntimeError as e:
+                # Raised once any inter-op parallel work has started
+                logger.warning(f"Could not set torch inter-op threads: {e}")
+        applied["torch_intra_op"] = torch.get_num_threads()
+        applied["torch_inter_op"] = torch.get_num_interop_threads()
+
+    if cv2_threads > 0:
+        import cv2
+        cv2.setNumThreads(cv2_threads)
+        applied["cv2_threads"] = cv2.getNumThreads()
+
+    return applied
+
+
+def claim_worker_slot(workers: int) -> int:
+    """
+    Claim a unique slot index among sibling worker processes
+
+    Uses non-blocking file locks, which the OS releases when a worker dies,
+    so a restarted worker reclaims the freed slot.
+
+    Returns:
+        Slot index in [0, workers), or -1 if every slot is taken or the
+        platform has no flock (e.g. Windows)
+    """
+    global _slot_lock_file, _worker_slot
+    if _slot_lock_file is not None:
+        return _worker_slot
+
+    try:
+        import fcntl
+    except ImportError:
+        logger.warning("File locking (fcntl) is unavailable on this platform; skipping worker slot pinning")
+        return -1
+
+    lock_dir = Path(tempfile.gettempdir()) / f"culinarylens-workers-{os.getppid()}"
+    lock_dir.mkdir(exist_ok=True)
+    for slot in range(workers):
+        handle = open(lock_dir / f"slot-{slot}.lock", "w")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            continue
+        _slot_lock_file = handle
+        _worker_slot = slot
+        return slot
+    return -1
+
+
+def apply_runtime_settings(settings) -> Dict[str, object]:
+    """
+    Apply tuned thread limits and optional CPU pinning from Settings
+
+    Called once per worker at startup, before models are loaded.
+    """
+    cpus = None
+    if settings.cpu_affinity:
+        slot = claim_worker_slot(settings.uvicorn_workers)
+        if slot >= 0:
+            partitions = partition_cpus(settings.uvicorn_workers)
+            cpus = partitions[slot % len(partitions)]
+        else:
+            logger.warning("Could not claim a worker slot; running without CPU affinity")
+
+    applied = apply_thread_limits(
+        intra_op=settings.torch_intra_op_threads,
+        inter_op=settings.torch_inter_op_threads,
+        cv2_threads=settings.cv2_threads,
+        cpus=cpus,
+    )
+    if applied:
+        logger.info(f"Runtime limits applied: {applied}")
+    return applied
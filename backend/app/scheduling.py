@@ -0,0 +1,317 @@
+"""Fair multi-tenant scheduling in front of the inference workers"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional, Set
+
+from app.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+LANES = ("interactive", "batch")
+
+# Idle buckets are dropped beyond this many clients
+_MAX_IDLE_BUCKETS = 1024
+
+
+class SchedulerRejected(Exception):
+    """Request refused at admission (rate limited or queue full)"""
+
+    def __init__(self, message: str, status_code: int = 429, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket; refills continuously at `rate` tokens/second"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, cost: float = 1.0, now: Optional[float] = None) -> float:
+        """
+        Take `cost` tokens if at least one whole token is available
+
+        The whole cost is admitted on one token (the bucket may go into
+        debt), so a batch larger than the burst is still admissible once.
+
+        Returns:
+            0 when admitted, otherwise seconds until a token is available
+        """
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= cost
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    @property
+    def full(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.burst
+
+
+class _Lane:
+    """Per-lane weighted fair queue (self-clocked fair queueing)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.heap: List[tuple] = []
+        self.virtual_time = 0.0
+        self.client_finish: Dict[str, float] = {}
+        self.running = 0
+
+    def push(self, client: str, weight: float, seq: int, future: asyncio.Future):
+        # A client's next request finishes 1/weight after its previous one,
+        # but never before the lane's current virtual time
+        start = max(self.virtual_time, self.client_finish.get(client, 0.0))
+        finish = start + 1.0 / weight
+        self.client_finish[client] = finish
+        heapq.heappush(self.heap, (finish, seq, client, future))
+
+    def pop(self) -> Optional[asyncio.Future]:
+        while self.heap:
+            finish, _, client, future = heapq.heappop(self.heap)
+            self.virtual_time = finish
+            if self.client_finish.get(client, 0.0) <= finish:
+                del self.client_finish[client]
+            if not future.cancelled():
+                return future
+        return None
+
+    @property
+    def depth(self) -> int:
+        return sum(1 for entry in self.heap if not entry[3].cancelled())
+
+
+class FairScheduler:
+    """
+    Admits, orders and runs blocking inference calls
+
+    Each client (API key or client header) has a token bucket checked at
+    admission. Admitted calls wait in one of two lanes: interactive calls
+    always dispatch before batch calls, and batch calls may not occupy the
+    slots reserved for interactive traffic. Within a lane, clients share
+    slots in proportion to their weights, so one client's burst cannot
+    starve the others.
+    """
+
+    def __init__(
+        self,
+        slots: int = 1,
+        interactive_reserved: int = 1,
+        rate: float = 0.0,
+        burst: float = 20.0,
+        max_queue: int = 256,
+        weights: Optional[Dict[str, float]] = None,
+    ):
+        """
+        Args:
+            slots: Pipeline calls run concurrently (the detector itself
+                serializes model inference)
+            interactive_reserved: Slots batch work may not use (batch keeps at least one)
+            rate: Per-client requests/second (0 disables rate limiting)
+            burst: Per-client bucket size
+            max_queue: Max waiting calls per lane before rejecting with 503
+            weights: Client ID -> fair-share weight (default 1)
+        """
+        self.slots = max(1, slots)
+        self.batch_slots = max(1, self.slots - interactive_reserved)
+        self.rate = rate
+        self.burst = burst
+        self.max_queue = max_queue
+        self.weights = weights or {}
+        self._lanes = {name: _Lane(name) for name in LANES}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._seq = itertools.count()
+        self._executor = ThreadPoolExecutor(max_workers=self.slots, thread_name_prefix="inference")
+
+    def admit(self, client: str, cost: float = 1.0):
+        """
+        Charge a client's token bucket
+
+        Raises:
+            SchedulerRejected: 429 with retry_after when the bucket is empty
+        """
+        if self.rate <= 0:
+            return
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            if len(self._buckets) >= _MAX_IDLE_BUCKETS:
+                self._prune_buckets()
+            bucket = self._buckets[client] = TokenBucket(self.rate, self.burst)
+
+        wait = bucket.try_acquire(cost)
+        if wait > 0:
+            get_metrics().increment("scheduler_rejected", reason="rate_limited")
+            raise SchedulerRejected("Rate limit exceeded", status_code=429, retry_after=wait)
+
+    def _prune_buckets(self):
+        """Drop idle buckets, then the least recently used if still over the cap"""
+        self._buckets = {key: b for key, b in self._buckets.items() if not b.full}
+        if len(self._buckets) >= _MAX_IDLE_BUCKETS:
+            recent = sorted(self._buckets.items(), key=lambda item: item[1].updated)
+            self._buckets = dict(recent[-(_MAX_IDLE_BUCKETS // 2):])
+
+    async def submit(
+        self,
+        fn: Callable[..., Any],
+        *args,
+        client: str = "anonymous",
+        lane: str = "interactive",
+        charge: bool = True,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """
+        Queue a blocking call and run it on the inference pool when scheduled
+
+        Args:
+            fn: Blocking callable
+            *args: Positional arguments for fn
+            client: Client identity for rate limiting and fair sharing
+            lane: "interactive" or "batch"
+            charge: Whether to charge the client's token bucket
+            timeout: Seconds the call may run once started. On expiry the
+                caller gets TimeoutError, but the slot stays occupied until
+                fn actually returns, so overruns never exceed the slot count.
+
+        Returns:
+            fn's return value
+
+        Raises:
+            SchedulerRejected: Rate limited (429) or lane queue full (503)
+            TimeoutError: The call overran timeout
+        """
+        if lane not in self._lanes:
+            raise ValueError(f"lane must be one of {LANES}")
+        if charge:
+            self.admit(client)
+
+        queue = self._lanes[lane]
+        if queue.depth >= self.max_queue:
+            get_metrics().increment("scheduler_rejected", reason="queue_full", lane=lane)
+            raise SchedulerRejected(f"{lane} queue is full", status_code=503, retry_after=1.0)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue.push(client, self.weights.get(client, 1.0), next(self._seq), future)
+        enqueued = time.perf_counter()
+        self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Slot was granted just as the caller went away
+            if future.done() and not future.cancelled():
+                self._release(lane)
+            raise
+
+        get_metrics().observe("scheduler_queue_seconds", time.perf_counter() - enqueued, lane=lane)
+        started = time.perf_counter()
+        work = self._executor.submit(fn, *args)
+        # Free the slot when the work really ends, even if the caller is cancelled first
+        work.add_done_callback(lambda _: self._finished_threadsafe(loop, lane, started))
+        result = asyncio.wrap_future(work)
+        if timeout is None:
+            return await result
+
+        # An abandoned overrun's outcome is never awaited; don't log it as lost
+        result.add_done_callback(lambda f: f.cancelled() or f.exception())
+        try:
+            return await asyncio.wait_for(asyncio.shield(result), timeout)
+        except asyncio.TimeoutError:
+            get_metrics().increment("scheduler_timeouts", lane=lane)
+            raise TimeoutError(f"Inference exceeded {timeout}s timeout")
+
+    def _finished_threadsafe(self, loop: asyncio.AbstractEventLoop, lane: str, started: float):
+        get_metrics().observe("scheduler_service_seconds", time.perf_counter() - started, lane=lane)
+        try:
+            loop.call_soon_threadsafe(self._release, lane)
+        except RuntimeError:
+            pass  # Loop closed during shutdown
+
+    def _release(self, lane: str):
+        self._lanes[lane].running -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Grant free slots: interactive first, batch within its share"""
+        interactive, batch = self._lanes["interactive"], self._lanes["batch"]
+        while interactive.running + batch.running < self.slots:
+            lane = interactive if interactive.heap else None
+            if lane is None and batch.heap and batch.running < self.batch_slots:
+                lane = batch
+            if lane is None:
+                return
+            future = lane.pop()
+            if future is not None:
+                lane.running += 1
+                future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and running calls per lane"""
+        return {
+            "slots": self.slots,
+            "batch_slots": self.batch_slots,
+            "lanes": {
+                name: {"queued": lane.depth, "running": lane.running}
+                for name, lane in self._lanes.items()
+            },
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def parse_api_keys(spec: str) -> Set[str]:
+    """Parse a comma-separated list of API keys"""
+    return {key.strip() for key in spec.split(",") if key.strip()}
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """Parse "client=weight,client=weight" into a dict"""
+    weights = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        client, _, weight = item.rpartition("=")
+        if not client or float(weight) <= 0:
+            raise ValueError(f"Invalid client weight: {item!r}")
+        weights[client.strip()] = float(weight)
+    return weights
+
+
+# Singleton scheduler
+_scheduler = None
+
+
+def get_scheduler() -> FairScheduler:
+    """Get process-wide inference scheduler"""
+    global _scheduler
+    if _scheduler is None:
+        from app.config import get_settings
+        settings = get_settings()
+        _scheduler = FairScheduler(
+            slots=settings.inference_slots,
+            interactive_reserved=settings.interactive_reserved_slots,
+            rate=settings.client_rate_limit,
+            burst=settings.client_burst,
+            max_queue=settings.scheduler_max_queue,
+            weights=parse_weights(settings.client_weights),
+        )
+        logger.info(
+            f"Scheduler: {_scheduler.slots} slot(s), batch up to {_scheduler.batch_slots}, "
+            f"rate limit {settings.client_rate_limit or 'off'}"
+        )
+    return _scheduler
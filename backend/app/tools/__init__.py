@@ -0,0 +1 @@
+"""Operational tooling (load testing, tuning, batch jobs)"""
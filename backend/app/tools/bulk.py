@@ -0,0 +1,326 @@
+"""
+Offline bulk perception over image archives
+
+Streams images from a directory or tar archive, decodes them ahead on a
+small thread pool, fans them out across a process pool (each worker owns
+one PerceptionPipeline), and writes results incrementally. A checkpoint file
+records each finished image with its status, so an interrupted run resumes
+where it stopped and failed images can be retried.
+
+Usage:
+    python -m app.tools.bulk ./archive results.jsonl --workers 4
+    python -m app.tools.bulk audit.tar.gz results.parquet --format parquet
+    python -m app.tools.bulk ./archive results.jsonl      # re-run resumes
+    python -m app.tools.bulk ./archive results.jsonl --retry-failed
+"""
+import argparse
+import io
+import json
+import logging
+import multiprocessing as mp
+import tarfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Callable, Dict, Any, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+# Per-process pipeline, created by the pool initializer
+_worker_pipeline = None
+
+
+def iter_images(source: str, skip: Optional[Set[str]] = None) -> Iterator[Tuple[str, bytes]]:
+    """
+    Yield (key, raw bytes) from a directory or tar archive, streaming
+
+    Tar archives are read sequentially ("r|*"), so compressed archives are
+    never fully extracted or seeked. Keys in skip are passed over without
+    reading their bytes, so resumed runs don't re-read finished images.
+    """
+    skip = skip or set()
+    path = Path(source)
+    if path.is_dir():
+        for file in sorted(path.rglob("*")):
+            if file.is_file() and file.suffix.lower() in IMAGE_SUFFIXES:
+                key = str(file.relative_to(path))
+                if key not in skip:
+                    yield key, file.read_bytes()
+        return
+
+    with tarfile.open(path, mode="r|*") as archive:
+        for member in archive:
+            if member.name in skip:
+                continue
+            if member.isfile() and Path(member.name).suffix.lower() in IMAGE_SUFFIXES:
+                handle = archive.extractfile(member)
+                if handle is not None:
+                    yield member.name, handle.read()
+
+
+def _init_worker(torch_threads: int, pipeline_factory: Optional[Callable[[], Any]] = None):
+    """Load models once per worker process"""
+    global _worker_pipeline
+    from app.runtime import apply_thread_limits
+
+    apply_thread_limits(intra_op=torch_threads, cv2_threads=1)
+    if pipeline_factory is not None:
+        _worker_pipeline = pipeline_factory()
+        return
+
+    from app.perception.pipeline import PerceptionPipeline
+    _worker_pipeline = PerceptionPipeline()
+    _worker_pipeline.initialize()
+
+
+def _decode(key: str, data: bytes) -> Dict[str, Any]:
+    """Decode one image in the parent's decode pool"""
+    from PIL import Image
+
+    start = time.perf_counter()
+    try:
+        image = Image.open(io.BytesIO(data)).convert("RGB")
+        return {"key": key, "image": image}
+    except Exception as e:
+        return {"key": key, "error": f"{type(e).__name__}: {e}", "seconds": round(time.perf_counter() - start, 4)}
+
+
+def _process_image(key: str, image) -> Dict[str, Any]:
+    """Analyze one decoded image inside a worker"""
+    start = time.perf_counter()
+    try:
+        result = _worker_pipeline.run(image)
+        return {"key": key, "result": result, "seconds": round(time.perf_counter() - start, 4)}
+    except Exception as e:
+        return {"key": key, "error": f"{type(e).__name__}: {e}", "seconds": round(time.perf_counter() - start, 4)}
+
+
+class Checkpoint:
+    """
+    Append-only log of finished keys and their status
+
+    Each line is "<key>\t<ok|failed>"; the last line for a key wins, so a
+    retried image that now succeeds moves from failed to done. Bare keys
+    (older checkpoints) count as done.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        status: Dict[str, str] = {}
+        if path.exists():
+            for line in path.read_text(encoding="utf-8").splitlines():
+                if line:
+                    key, _, state = line.partition("\t")
+                    status[key] = state or "ok"
+        self.done: Set[str] = {key for key, state in status.items() if state == "ok"}
+        self.failed: Set[str] = {key for key, state in status.items() if state != "ok"}
+        self._handle = open(path, "a", encoding="utf-8")
+
+    def mark(self, records: List[Dict[str, Any]]):
+        self._handle.write("".join(
+            f"{r['key']}\t{'failed' if 'error' in r else 'ok'}\n" for r in records
+        ))
+        self._handle.flush()
+
+    def close(self):
+        self._handle.close()
+
+
+class JsonlWriter:
+    """Appends one JSON record per line"""
+
+    def __init__(self, path: Path):
+        self._handle = open(path, "a", encoding="utf-8")
+
+    def write(self, records: List[Dict[str, Any]]):
+        for record in records:
+            self._handle.write(json.dumps(record) + "\n")
+        self._handle.flush()
+
+    def close(self):
+        self._handle.close()
+
+
+class ParquetWriter:
+    """Writes each flush as a new part file under a directory (requires pyarrow)"""
+
+    def __init__(self, path: Path):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise SystemExit("Parquet output requires pyarrow (pip install pyarrow)")
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._part = len(list(self.path.glob("part-*.parquet")))
+
+    def write(self, records: List[Dict[str, Any]]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        rows = {
+            "key": [r["key"] for r in records],
+            "result": [json.dumps(r.get("result")) if "result" in r else None for r in records],
+            "error": [r.get("error") for r in records],
+            "seconds": [r["seconds"] for r in records],
+        }
+        pq.write_table(pa.table(rows), self.path / f"part-{self._part:05d}.parquet")
+        self._part += 1
+
+    def close(self):
+        pass
+
+
+def run_bulk(
+    source: str,
+    output: str,
+    output_format: str = "jsonl",
+    workers: int = 2,
+    prefetch: int = 4,
+    decode_threads: int = 2,
+    torch_threads: int = 1,
+    flush_every: int = 64,
+    report_every: float = 10.0,
+    retry_failed: bool = False,
+    pipeline_factory: Optional[Callable[[], Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Analyze every image under source, resuming from the checkpoint
+
+    Args:
+        source: Directory or tar archive
+        output: JSONL file or Parquet directory
+        output_format: "jsonl" or "parquet"
+        workers: Worker processes
+        prefetch: Images read and decoded ahead per worker
+        decode_threads: Threads decoding images ahead of the workers
+        torch_threads: torch intra-op threads per worker
+        flush_every: Records buffered before writing + checkpointing
+        report_every: Seconds between progress logs
+        retry_failed: Re-run images the checkpoint records as failed
+            (their new record is appended after the old one)
+        pipeline_factory: Picklable callable building each worker's
+            pipeline (default: PerceptionPipeline)
+
+    Returns:
+        Run summary
+    """
+    output_path = Path(output)
+    checkpoint = Checkpoint(output_path.with_name(output_path.name + ".checkpoint"))
+    writer = ParquetWriter(output_path) if output_format == "parquet" else JsonlWriter(output_path)
+    skip = checkpoint.done if retry_failed else checkpoint.done | checkpoint.failed
+    skipped = len(skip)
+    if skipped:
+        logger.info(f"Resuming: {len(checkpoint.done)} images done, {len(checkpoint.failed)} failed")
+    if checkpoint.failed and not retry_failed:
+        logger.info("Skipping previously failed images (use --retry-failed to re-run them)")
+
+    processed = failed = 0
+    buffer: List[Dict[str, Any]] = []
+    start = last_report = time.perf_counter()
+
+    def flush():
+        # Results are written before keys are checkpointed, so a crash
+        # between the two re-does an image rather than losing it
+        if buffer:
+            writer.write(buffer)
+            checkpoint.mark(buffer)
+            buffer.clear()
+
+    def collect(record):
+        nonlocal processed, failed
+        failed += "error" in record
+        processed += 1
+        buffer.append(record)
+
+    ctx = mp.get_context("spawn")
+    window = workers * prefetch
+    decoding = deque()
+    pending = set()
+    images = iter_images(source, skip=skip)
+    try:
+        with ThreadPoolExecutor(decode_threads) as decoder, \
+                ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker, initargs=(torch_threads, pipeline_factory)) as pool:
+            exhausted = False
+            while pending or decoding or not exhausted:
+                # Keep decodes running ahead of the pool while bounding how
+                # many images are held in memory
+                while not exhausted and len(decoding) + len(pending) < window:
+                    item = next(images, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    decoding.append(decoder.submit(_decode, *item))
+
+                # Hand decoded images over in read order, one queued per worker
+                while decoding and len(pending) < workers * 2:
+                    decoded = decoding.popleft().result()
+                    if "error" in decoded:
+                        collect(decoded)
+                    else:
+                        pending.add(pool.submit(_process_image, decoded["key"], decoded["image"]))
+                if not pending:
+                    continue
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future.result())
+                if len(buffer) >= flush_every:
+                    flush()
+
+                now = time.perf_counter()
+                if now - last_report >= report_every:
+                    logger.info(f"{processed} images ({processed / (now - start):.2f} img/s), {failed} failed")
+                    last_report = now
+    finally:
+        flush()
+        checkpoint.close()
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        "processed": processed,
+        "failed": failed,
+        "skipped": skipped,
+        "seconds": round(elapsed, 2),
+        "images_per_sec": round(processed / elapsed, 2) if elapsed else 0.0,
+    }
+    logger.info(f"Done: {summary}")
+    return summary
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Run perception over an image archive")
+    parser.add_argument("source", help="Directory or tar archive of images")
+    parser.add_argument("output", help="Output JSONL file or Parquet directory")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], help="Output format (default: from extension)")
+    parser.add_argument("--workers", type=int, default=max(1, (mp.cpu_count() or 2) // 2))
+    parser.add_argument("--prefetch", type=int, default=4, help="Images read and decoded ahead per worker")
+    parser.add_argument("--decode-threads", type=int, default=2, help="Threads decoding images ahead of the workers")
+    parser.add_argument("--torch-threads", type=int, default=1, help="torch intra-op threads per worker")
+    parser.add_argument("--flush-every", type=int, default=64)
+    parser.add_argument("--report-every", type=float, default=10.0)
+    parser.add_argument("--retry-failed", action="store_true", help="Re-run images that failed in earlier runs")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    output_format = args.format or ("parquet" if args.output.endswith(".parquet") else "jsonl")
+    run_bulk(
+        args.source,
+        args.output,
+        output_format=output_format,
+        workers=args.workers,
+        prefetch=args.prefetch,
+        decode_threads=args.decode_threads,
+        torch_threads=args.torch_threads,
+        flush_every=args.flush_every,
+        report_every=args.report_every,
+        retry_failed=args.retry_failed,
+    )
+
+
+if __name__ == "__main__":
+    main()
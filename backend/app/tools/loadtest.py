@@ -0,0 +1,436 @@
+"""
+HTTP load-test harness for the perception API
+
+Drives the real FastAPI app at stepped concurrency levels and records
+throughput, latency percentiles, error/timeout rates and server RSS.
+
+Usage:
+    python -m app.tools.loadtest --mode mock --concurrency 1,4,16 --duration 20
+    python -m app.tools.loadtest --mode real --images ./corpus --output real.json
+    python -m app.tools.loadtest --url http://host:8000 --server-pid 1234
+    python -m app.tools.loadtest --mode mock --compare baseline.json
+    python -m app.tools.loadtest --endpoint "/api/jobs?tier=accurate" --batch-size 8
+
+Batch endpoints (/api/jobs) are driven end to end: each request submits
+a batch, polls the job until it finishes, and records the full latency.
+"""
+import argparse
+import asyncio
+import io
+import json
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+DEFAULT_ENDPOINTS = ["/api/perception/analyze", "/api/perception/analyze-for-gemini"]
+JOBS_ENDPOINT = "/api/jobs"
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+
+def load_corpus(images_dir: Optional[str], synthetic: int = 8) -> List[Tuple[str, bytes]]:
+    """
+    Load (filename, bytes) pairs from a directory, or synthesize JPEGs
+
+    Args:
+        images_dir: Directory of images, or None for a synthetic corpus
+        synthetic: Number of synthetic images to generate
+
+    Returns:
+        List of (filename, encoded bytes)
+    """
+    if images_dir:
+        files = sorted(p for p in Path(images_dir).rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)
+        if not files:
+            raise SystemExit(f"No images found in {images_dir}")
+        return [(p.name, p.read_bytes()) for p in files]
+
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    corpus = []
+    for i in range(synthetic):
+        # Smooth scenes encode like photos; pure noise bloats JPEG size
+        coarse = rng.integers(0, 255, (12, 16, 3), dtype=np.uint8)
+        image = Image.fromarray(coarse).resize((1280, 960), Image.Resampling.BICUBIC)
+        buf = io.BytesIO()
+        image.save(buf, format="JPEG", quality=85)
+        corpus.append((f"synthetic_{i}.jpg", buf.getvalue()))
+    return corpus
+
+
+def process_tree_rss(pid: int) -> Optional[int]:
+    """Resident set size in bytes of a process and all descendants (Linux)"""
+    total = 0
+    stack = [pid]
+    seen = set()
+    while stack:
+        current = stack.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    stack.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            if current == pid:
+                return None
+    return total
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (q in 0-100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def is_jobs_endpoint(endpoint: str) -> bool:
+    """Whether an endpoint (optionally with a query string) is the batch jobs API"""
+    return endpoint.split("?", 1)[0].rstrip("/") == JOBS_ENDPOINT
+
+
+async def post_image(client: httpx.AsyncClient, endpoint: str, image: Tuple[str, bytes], timeout: float) -> str:
+    """One synchronous analysis request; returns the status code as the outcome"""
+    name, data = image
+    response = await client.post(endpoint, files={"file": (name, data, "image/jpeg")}, timeout=timeout)
+    return str(response.status_code)
+
+
+async def run_job(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    batch: List[Tuple[str, bytes]],
+    timeout: float,
+    poll_interval: float = 0.2,
+) -> str:
+    """
+    Submit a batch job and poll it until it finishes
+
+    Returns:
+        "200" when the job succeeded, "job_failed", "timeout", or the
+        submission's status code if it was not accepted
+    """
+    deadline = time.perf_counter() + timeout
+    response = await client.post(
+        endpoint, files=[("files", (name, data, "image/jpeg")) for name, data in batch], timeout=timeout
+    )
+    if response.status_code != 202:
+        return str(response.status_code)
+
+    status_url = response.json()["status_url"]
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(poll_interval)
+        status = await client.get(status_url, timeout=max(0.1, deadline - time.perf_counter()))
+        if status.status_code != 200:
+            return str(status.status_code)
+        job = status.json()
+        if job["status"] == "succeeded":
+            return "200"
+        if job["status"] == "failed":
+            return "job_failed"
+    return "timeout"
+
+
+class ServerProcess:
+    """Spawns uvicorn serving main:app for the duration of a run"""
+
+    def __init__(self, mode: str, port: int, workers: int, allow_reuse: bool, startup_timeout: float):
+        self.mode = mode
+        self.port = port
+        self.workers = workers
+        self.allow_reuse = allow_reuse
+        self.startup_timeout = startup_timeout
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "ServerProcess":
+        env = dict(os.environ)
+        env["MOCK_MODE"] = "true" if self.mode == "mock" else "false"
+        # Corpus images repeat, so near-duplicate reuse would hide real cost
+        env["ENABLE_NEAR_DUPLICATE_REUSE"] = "true" if self.allow_reuse else "false"
+        cmd = [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(self.port),
+            "--workers", str(self.workers), "--log-level", "warning",
+        ]
+        logger.info(f"Starting server ({self.mode} mode, {self.workers} worker(s)) on port {self.port}")
+        self.process = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env)
+
+        deadline = time.time() + self.startup_timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise SystemExit(f"Server exited during startup (code {self.process.returncode})")
+            try:
+                if httpx.get(self.url + "/", timeout=1.0).status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.25)
+        self.__exit__(None, None, None)
+        raise SystemExit(f"Server not ready after {self.startup_timeout}s")
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        return False
+
+
+async def run_step(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    corpus: List[Tuple[str, bytes]],
+    concurrency: int,
+    duration: float,
+    request_timeout: float,
+    server_pid: Optional[int],
+    batch_size: int = 4,
+) -> Dict[str, Any]:
+    """
+    Hammer one endpoint with a fixed number of concurrent clients
+
+    For the jobs endpoint each client submits batches of batch_size images
+    and waits for them to finish; latency is submit-to-done.
+
+    Returns:
+        Step statistics
+    """
+    jobs = is_jobs_endpoint(endpoint)
+    latencies: List[float] = []
+    status_counts: Dict[str, int] = {}
+    rss_samples: List[int] = []
+    deadline = time.perf_counter() + duration
+    rng = random.Random(concurrency)
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                if jobs:
+                    batch = [corpus[rng.randrange(len(corpus))] for _ in range(batch_size)]
+                    outcome = await run_job(client, endpoint, batch, request_timeout)
+                else:
+                    outcome = await post_image(client, endpoint, corpus[rng.randrange(len(corpus))], request_timeout)
+            except httpx.TimeoutException:
+                outcome = "timeout"
+            except httpx.HTTPError:
+                outcome = "connection_error"
+            if outcome == "200":
+                latencies.append(time.perf_counter() - start)
+            status_counts[outcome] = status_counts.get(outcome, 0) + 1
+
+    async def rss_sampler():
+        while time.perf_counter() < deadline:
+            rss = process_tree_rss(server_pid)
+            if rss is not None:
+                rss_samples.append(rss)
+            await asyncio.sleep(0.5)
+
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    if server_pid:
+        tasks.append(asyncio.create_task(rss_sampler()))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    total = sum(status_counts.values())
+    timeouts = status_counts.get("timeout", 0) + status_counts.get("504", 0)
+    errors = total - len(latencies) - timeouts
+
+    def ms(value):
+        return round(value * 1000, 1) if value is not None else None
+
+    images_per_request = batch_size if jobs else 1
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "batch_size": images_per_request,
+        "duration_s": round(elapsed, 2),
+        "requests": total,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "images_per_s": round(len(latencies) * images_per_request / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(max(latencies) if latencies else None),
+        },
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "timeout_rate": round(timeouts / total, 4) if total else 0.0,
+        "status_counts": status_counts,
+        "rss_mb": {
+            "peak": round(max(rss_samples) / 2**20, 1) if rss_samples else None,
+            "end": round(rss_samples[-1] / 2**20, 1) if rss_samples else None,
+        },
+    }
+
+
+async def run_load_test(
+    url: str,
+    endpoints: List[str],
+    corpus: List[Tuple[str, bytes]],
+    levels: List[int],
+    duration: float,
+    warmup: float,
+    request_timeout: float,
+    server_pid: Optional[int],
+    batch_size: int = 4,
+    headers: Optional[Dict[str, str]] = None,
+) -> List[Dict[str, Any]]:
+    """Run every endpoint at every concurrency level, in order"""
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    steps = []
+    async with httpx.AsyncClient(base_url=url, limits=limits, headers=headers) as client:
+        for endpoint in endpoints:
+            if warmup > 0:
+                await run_step(client, endpoint, corpus, 1, warmup, request_timeout, None, batch_size)
+            for level in levels:
+                step = await run_step(
+                    client, endpoint, corpus, level, duration, request_timeout, server_pid, batch_size
+                )
+                print(format_step(step), flush=True)
+                steps.append(step)
+    return steps
+
+
+def format_step(step: Dict[str, Any]) -> str:
+    lat = step["latency_ms"]
+    return (
+        f"{step['endpoint']:<40} c={step['concurrency']:<4} "
+        f"{step['throughput_rps']:>8.2f} rps ({step['images_per_s']:.2f} img/s)  "
+        f"p50={lat['p50']}ms p95={lat['p95']}ms p99={lat['p99']}ms  "
+        f"err={step['error_rate']:.2%} timeout={step['timeout_rate']:.2%}  "
+        f"rss_peak={step['rss_mb']['peak']}MB"
+    )
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """Per-step throughput and p95 deltas between two reports"""
+    index = {(s["endpoint"], s["concurrency"]): s for s in baseline.get("steps", [])}
+    lines = []
+    for step in current.get("steps", []):
+        base = index.get((step["endpoint"], step["concurrency"]))
+        if base is None:
+            continue
+        rps_delta = step["throughput_rps"] - base["throughput_rps"]
+        rps_pct = (rps_delta / base["throughput_rps"] * 100) if base["throughput_rps"] else float("nan")
+        p95, base_p95 = step["latency_ms"]["p95"], base["latency_ms"]["p95"]
+        p95_delta = f"{p95 - base_p95:+.1f}ms" if p95 is not None and base_p95 is not None else "n/a"
+        lines.append(
+            f"{step['endpoint']:<40} c={step['concurrency']:<4} "
+            f"rps {base['throughput_rps']:.2f} -> {step['throughput_rps']:.2f} ({rps_pct:+.1f}%)  "
+            f"p95 {p95_delta}"
+        )
+    return lines
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Load-test the perception API")
+    parser.add_argument("--mode", choices=["mock", "real"], default="mock", help="Server mode when spawning")
+    parser.add_argument("--url", help="Target an already running server instead of spawning one")
+    parser.add_argument("--server-pid", type=int, help="PID to sample RSS from when using --url")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when spawning")
+    parser.add_argument("--endpoint", action="append", dest="endpoints", help="Endpoint path (repeatable)")
+    parser.add_argument("--images", help="Directory of corpus images (default: synthetic)")
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per step")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Warmup seconds per endpoint")
+    parser.add_argument("--request-timeout", type=float, default=30.0, help="Per request (per job for /api/jobs)")
+    parser.add_argument("--batch-size", type=int, default=4, help="Images per job for /api/jobs")
+    parser.add_argument("--api-key", help="X-API-Key to send (must be in the server's API_KEYS)")
+    parser.add_argument("--lane", choices=["interactive", "batch"], help="X-Request-Lane to send")
+    parser.add_argument("--startup-timeout", type=float, default=180.0)
+    parser.add_argument("--allow-reuse", action="store_true", help="Keep near-duplicate reuse enabled")
+    parser.add_argument("--output", help="Write JSON report here")
+    parser.add_argument("--compare", help="Baseline JSON report to diff against")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    # Per-request client logs would drown the step summaries
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    endpoints = args.endpoints or DEFAULT_ENDPOINTS
+    corpus = load_corpus(args.images)
+    headers = {}
+    if args.api_key:
+        headers["X-API-Key"] = args.api_key
+    if args.lane:
+        headers["X-Request-Lane"] = args.lane
+
+    def execute(url: str, pid: Optional[int]) -> List[Dict[str, Any]]:
+        return asyncio.run(run_load_test(
+            url, endpoints, corpus, levels, args.duration, args.warmup, args.request_timeout, pid,
+            batch_size=args.batch_size, headers=headers
+        ))
+
+    if args.url:
+        steps = execute(args.url, args.server_pid)
+        mode = "external"
+    else:
+        with ServerProcess(args.mode, args.port, args.workers, args.allow_reuse, args.startup_timeout) as server:
+            steps = execute(server.url, server.process.pid)
+        mode = args.mode
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "mode": mode,
+            "workers": args.workers,
+            "endpoints": endpoints,
+            "concurrency": levels,
+            "duration_s": args.duration,
+            "corpus_size": len(corpus),
+            "batch_size": args.batch_size,
+            "lane": args.lane,
+            "near_duplicate_reuse": args.allow_reuse,
+        },
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "steps": steps,
+    }
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        logger.info(f"Report written to {args.output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        print("\nComparison vs", args.compare)
+        for line in compare_reports(baseline, report):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Manage the local model artifact store
+
+Run `add` on a machine that has the checkpoint, then copy the store
+directory (MODEL_STORE_DIR) to offline nodes. Servers only ever read from
+the store, so startup never needs the network.
+
+Usage:
+    python -m app.tools.models add yolov8n.pt --version 8.3.64
+    python -m app.tools.models export yolov8n --format onnx
+    python -m app.tools.models verify
+    python -m app.tools.models list
+    python -m app.tools.models activate yolov8n 8.3.64
+"""
+import argparse
+import logging
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+from app.perception.artifacts import ArtifactError, ArtifactStore
+
+logger = logging.getLogger(__name__)
+
+# Export formats that produce a single file (checksummed as one artifact)
+EXPORT_FORMATS = ("onnx", "torchscript", "engine")
+
+
+def add_model(
+    store: ArtifactStore,
+    weights: str,
+    name: Optional[str] = None,
+    version: str = "1",
+    fast_state: bool = True,
+    activate: bool = True,
+):
+    """
+    Register a local checkpoint and (by default) its fast-loading state
+
+    Args:
+        store: Target store
+        weights: Local .pt checkpoint
+        name: Model name (default: checkpoint stem)
+        version: Version label
+        fast_state: Also generate the memory-mappable fused state dict
+        activate: Make this version the default
+    """
+    if not Path(weights).exists():
+        raise ArtifactError(f"{weights} does not exist (this tool never downloads)")
+    name = name or Path(weights).stem
+    files = {"weights": weights}
+    metadata = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if fast_state:
+            from app.perception.detector import export_fast_state
+            exported = export_fast_state(weights, tmp)
+            files.update(exported["files"])
+            metadata.update(exported["metadata"])
+        return store.add(name, version, files, metadata=metadata, activate=activate)
+
+
+def export_model(store: ArtifactStore, name: str, export_format: str, version: Optional[str] = None, imgsz: int = 640):
+    """
+    Export a registered checkpoint to an inference engine and register it
+
+    Needs the format's exporter (e.g. the onnx package) installed.
+    """
+    from ultralytics import YOLO
+
+    manifest = store.resolve(name, version)
+    weights = store.path(manifest, "weights")
+    exported = YOLO(str(weights)).export(format=export_format, imgsz=imgsz)
+    return store.add(
+        name, manifest["version"], {export_format: exported},
+        metadata={f"{export_format}_imgsz": imgsz}, activate=False,
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Manage local model artifacts")
+    parser.add_argument("--store", default=None, help="Store directory (default: MODEL_STORE_DIR)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="Register a checkpoint")
+    add.add_argument("weights", help="Local .pt checkpoint")
+    add.add_argument("--name", help="Model name (default: file stem)")
+    add.add_argument("--version", default="1")
+    add.add_argument("--no-state", action="store_true", help="Skip the fast-loading state dict")
+    add.add_argument("--no-activate", action="store_true")
+
+    export = commands.add_parser("export", help="Export a registered model to an engine file")
+    export.add_argument("name")
+    export.add_argument("--format", choices=EXPORT_FORMATS, default="onnx")
+    export.add_argument("--version")
+    export.add_argument("--imgsz", type=int, default=640)
+
+    verify = commands.add_parser("verify", help="Check artifact checksums")
+    verify.add_argument("name", nargs="?")
+    verify.add_argument("--version")
+
+    commands.add_parser("list", help="List registered versions")
+
+    activate = commands.add_parser("activate", help="Set the default version")
+    activate.add_argument("name")
+    activate.add_argument("version")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    if args.store is None:
+        from app.config import get_settings
+        args.store = get_settings().model_store_dir
+    store = ArtifactStore(args.store)
+
+    try:
+        if args.command == "add":
+            add_model(store, args.weights, args.name, args.version, not args.no_state, not args.no_activate)
+        elif args.command == "export":
+            export_model(store, args.name, args.format, args.version, args.imgsz)
+        elif args.command == "activate":
+            store.activate(args.name, args.version)
+        elif args.command == "list":
+            for entry in store.list():
+                files = ", ".join(f"{kind} {size / 2**20:.1f}MB" for kind, size in entry["files"].items())
+                print(f"{'*' if entry['active'] else ' '} {entry['name']}@{entry['version']}: {files}")
+        elif args.command == "verify":
+            names = [args.name] if args.name else sorted({e["name"] for e in store.list()})
+            failed = False
+            for name in names:
+                problems = store.verify(name, args.version if args.name else None)
+                for problem in problems:
+                    print(f"FAIL {problem}")
+                failed = failed or bool(problems)
+                if not problems:
+                    print(f"OK   {name}@{args.version or store.active_version(name)}")
+            if failed:
+                sys.exit(1)
+    except ArtifactError as e:
+        logger.error(str(e))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Thread and worker auto-tuner
+
+Benchmarks combinations of worker processes, torch intra/inter-op threads
+and OpenCV threads on this machine by running the real PerceptionPipeline
+in each worker, then writes the fastest configuration to the .env file
+that Settings reads.
+
+Usage:
+    python -m app.tools.tune                     # benchmark and update .env
+    python -m app.tools.tune --duration 20 --dry-run
+    python -m app.tools.tune --workers 1,2,4 --affinity
+"""
+import argparse
+import json
+import logging
+import multiprocessing as mp
+import queue
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from app.runtime import apply_thread_limits, partition_cpus, physical_cores, available_cpus
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+
+def candidate_configs(cores: int, worker_options: Optional[List[int]] = None) -> List[Dict[str, int]]:
+    """
+    Enumerate configurations that never oversubscribe physical cores
+
+    Args:
+        cores: Physical cores available
+        worker_options: Worker counts to try (default: powers of two)
+
+    Returns:
+        List of configs with workers, torch_intra_op, torch_inter_op, cv2_threads
+    """
+    if worker_options is None:
+        worker_options = []
+        w = 1
+        while w <= cores:
+            worker_options.append(w)
+            w *= 2
+
+    configs = []
+    for workers in worker_options:
+        if workers < 1 or workers > cores:
+            continue
+        per_worker = max(1, cores // workers)
+        for intra in sorted({per_worker, max(1, per_worker // 2)}, reverse=True):
+            for inter in sorted({1, min(2, per_worker)}):
+                for cv2_threads in sorted({1, per_worker}):
+                    configs.append({
+                        "workers": workers,
+                        "torch_intra_op": intra,
+                        "torch_inter_op": inter,
+                        "cv2_threads": cv2_threads,
+                    })
+    return configs
+
+
+def _synthetic_images(count: int = 4):
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    images = []
+    for _ in range(count):
+        coarse = rng.integers(0, 255, (12, 16, 3), dtype=np.uint8)
+        images.append(Image.fromarray(coarse).resize((1280, 960), Image.Resampling.BICUBIC))
+    return images
+
+
+def _load_images(images_dir: Optional[str]):
+    if not images_dir:
+        return _synthetic_images()
+    from PIL import Image
+    suffixes = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+    paths = sorted(p for p in Path(images_dir).rglob("*") if p.suffix.lower() in suffixes)[:16]
+    return [Image.open(p).convert("RGB") for p in paths] or _synthetic_images()
+
+
+def _bench_worker(config, cpus, images_dir, warmup, duration, barrier, results):
+    """Runs in a spawned process: apply limits, warm up, then count images"""
+    try:
+        apply_thread_limits(
+            intra_op=config["torch_intra_op"],
+            inter_op=config["torch_inter_op"],
+            cv2_threads=config["cv2_threads"],
+            cpus=cpus,
+        )
+        from app.perception.pipeline import PerceptionPipeline
+
+        pipeline = PerceptionPipeline()
+        pipeline.initialize()
+        images = _load_images(images_dir)
+
+        warm_until = time.perf_counter() + warmup
+        i = 0
+        while time.perf_counter() < warm_until:
+            pipeline.run(images[i % len(images)])
+            i += 1
+    except Exception as e:
+        barrier.abort()
+        results.put({"error": repr(e)})
+        return
+
+    # Start every worker together so they actually contend for cores
+    try:
+        barrier.wait()
+    except Exception:
+        results.put({"error": "benchmark aborted by a sibling worker"})
+        return
+    try:
+        latencies = []
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            pipeline.run(images[len(latencies) % len(images)])
+            latencies.append(time.perf_counter() - start)
+    except Exception as e:
+        results.put({"error": repr(e)})
+        return
+    results.put({"latencies": latencies})
+
+
+def _collect_results(results, count: int, timeout: float):
+    """
+    Gather one outcome per worker from the results queue
+
+    Returns:
+        Tuple of (all latencies, first error message or None)
+    """
+    latencies = []
+    errors = []
+    deadline = time.monotonic() + timeout
+    for _ in range(count):
+        try:
+            outcome = results.get(timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+            errors.append(f"no result from a worker within {timeout:.0f}s")
+            break
+        if "error" in outcome:
+            errors.append(outcome["error"])
+        else:
+            latencies.extend(outcome["latencies"])
+    return latencies, errors[0] if errors else None
+
+
+def benchmark_config(
+    config: Dict[str, int],
+    affinity: bool,
+    images_dir: Optional[str],
+    warmup: float,
+    duration: float,
+) -> Dict[str, Any]:
+    """
+    Measure aggregate throughput of one configuration
+
+    Returns:
+        Config merged with images_per_sec and p95_ms, or with an error
+        message (and None metrics) when a worker failed
+    """
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(config["workers"])
+    results = ctx.Queue()
+    partitions = partition_cpus(config["workers"]) if affinity else [None] * config["workers"]
+
+    procs = [
+        ctx.Process(
+            target=_bench_worker,
+            args=(config, partitions[i % len(partitions)], images_dir, warmup, duration, barrier, results),
+        )
+        for i in range(config["workers"])
+    ]
+    for proc in procs:
+        proc.start()
+
+    latencies, error = _collect_results(results, len(procs), warmup + duration + 300)
+    for proc in procs:
+        if error:
+            proc.terminate()
+        proc.join()
+    if error:
+        return {**config, "images_per_sec": None, "p95_ms": None, "error": error}
+
+    latencies.sort()
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)] if latencies else None
+    return {
+        **config,
+        "images_per_sec": round(len(latencies) / duration, 2),
+        "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+    }
+
+
+def write_env(env_path: Path, values: Dict[str, Any]):
+    """Update or append KEY=value lines in an env file, keeping the rest"""
+    lines = env_path.read_text(encoding="utf-8").splitlines() if env_path.exists() else []
+    pending = dict(values)
+    updated = []
+    for line in lines:
+        key = line.split("=", 1)[0].strip()
+        if key in pending:
+            updated.append(f"{key}={pending.pop(key)}")
+        else:
+            updated.append(line)
+    if pending:
+        updated.append("")
+        updated.append("# Thread/worker tuning (written by app.tools.tune)")
+        updated.extend(f"{key}={value}" for key, value in pending.items())
+    env_path.write_text("\n".join(updated) + "\n", encoding="utf-8")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark thread/worker configurations")
+    parser.add_argument("--workers", help="Comma-separated worker counts (default: powers of two)")
+    parser.add_argument("--images", help="Directory of benchmark images (default: synthetic)")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Warmup seconds per worker")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per config")
+    parser.add_argument("--affinity", action="store_true", help="Pin each worker to its own cores")
+    parser.add_argument("--env-file", default=str(BACKEND_DIR / ".env"), help="Settings file to update")
+    parser.add_argument("--report", help="Write all results as JSON")
+    parser.add_argument("--dry-run", action="store_true", help="Do not modify the env file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    cores = physical_cores()
+    logger.info(f"{len(available_cpus())} logical CPUs on {len(cores)} physical cores")
+
+    worker_options = [int(w) for w in args.workers.split(",")] if args.workers else None
+    configs = candidate_configs(len(cores), worker_options)
+    logger.info(f"Benchmarking {len(configs)} configurations")
+
+    results = []
+    for config in configs:
+        result = benchmark_config(config, args.affinity, args.images, args.warmup, args.duration)
+        results.append(result)
+        if result.get("error"):
+            logger.warning(
+                f"workers={result['workers']} intra={result['torch_intra_op']} "
+                f"inter={result['torch_inter_op']} cv2={result['cv2_threads']} -> "
+                f"failed: {result['error']}"
+            )
+            continue
+        logger.info(
+            f"workers={result['workers']} intra={result['torch_intra_op']} "
+            f"inter={result['torch_inter_op']} cv2={result['cv2_threads']} -> "
+            f"{result['images_per_sec']} img/s, p95 {result['p95_ms']}ms"
+        )
+
+    succeeded = [r for r in results if not r.get("error")]
+    best = max(succeeded, key=lambda r: r["images_per_sec"]) if succeeded else None
+    if args.report:
+        Path(args.report).write_text(json.dumps({"best": best, "results": results}, indent=2), encoding="utf-8")
+    if best is None:
+        logger.error("Every configuration failed; leaving the env file unchanged")
+        raise SystemExit(1)
+
+    values = {
+        "UVICORN_WORKERS": best["workers"],
+        "TORCH_INTRA_OP_THREADS": best["torch_intra_op"],
+        "TORCH_INTER_OP_THREADS": best["torch_inter_op"],
+        "CV2_THREADS": best["cv2_threads"],
+        "CPU_AFFINITY": str(args.affinity).lower(),
+    }
+    logger.info(f"Best configuration: {values} ({best['images_per_sec']} img/s)")
+
+    if not args.dry_run:
+        write_env(Path(args.env_file), values)
+        logger.info(f"Updated {args.env_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,33 @@
 """FastAPI backend server with ML perception endpoint"""
+import asyncio
+import functools
+import json
 import logging
-from fastapi import FastAPI, UploadFile, File, HTTPException
+import os
+import random
+from fastapi import FastAPI, UploadFile, File, HTTPException, Body, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from PIL import Image
 import io
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 from app.config import get_settings
+from app.runtime import configure_thread_environment, apply_runtime_settings
+
+# OpenMP/BLAS read thread counts once at import, so export them before torch loads
+configure_thread_environment(get_settings())
+
 from app.perception import run_perception_pipeline
+from app.perception.profiling import get_profile_path
+from app.perception.tiers import PERFORMANCE_TIERS, resolve_tier
+from app.metrics import get_metrics
+from app.memory import MemoryWatchdog, current_rss, get_heap_snapshots
+from app.scheduling import LANES, SchedulerRejected, get_scheduler, parse_api_keys, parse_weights
+from app.jobs import JobStore, JobRunner
+from app.jobs.store import TERMINAL_STATUSES
 from app.adapters.gemini_adapter import prepare_gemini_input
+from app.adapters.gemini_proxy import get_gemini_proxy, GeminiProxyError
 
 # Configure logging
 logging.basicConfig(
@@ -27,6 +45,23 @@ app = FastAPI(
 
 settings = get_settings()
 
+# Durable job queue, created on startup
+job_store: Optional[JobStore] = None
+job_runner: Optional[JobRunner] = None
+
+# Per-worker RSS budget; recycles this worker when exceeded
+memory_watchdog = MemoryWatchdog(
+    ceiling_bytes=settings.memory_ceiling_mb * 2**20,
+    soft_ratio=settings.memory_soft_ratio,
+    interval=settings.memory_check_interval,
+    # Only uvicorn --workers restarts a worker that exits; a lone process would just stop
+    supervised=settings.uvicorn_workers > 1
+)
+in_flight_requests = 0
+
+# Only these X-API-Key values name a client; weighted clients count as known
+known_api_keys = parse_api_keys(settings.api_keys) | set(parse_weights(settings.client_weights))
+
 # CORS configuration (allows frontend to call backend)
 app.add_middleware(
     CORSMiddleware,
@@ -37,9 +72,28 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def track_request_memory(request: Request, call_next):
+    """Record RSS after each request (and its change) per route"""
+    global in_flight_requests
+    in_flight_requests += 1
+    rss_before = current_rss()
+    try:
+        return await call_next(request)
+    finally:
+        in_flight_requests -= 1
+        rss_after = current_rss()
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        metrics = get_metrics()
+        metrics.observe("request_rss_bytes", rss_after, route=route)
+        metrics.observe("request_rss_delta_bytes", rss_after - rss_before, route=route)
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize ML models on startup"""
+    apply_runtime_settings(settings)
+    
     if settings.enable_ml_perception and not settings.mock_mode:
         logger.info("Preloading ML models...")
         try:
@@ -49,6 +103,32 @@ async def startup_event():
         except Exception as e:
             logger.error(f"Failed to load ML models: {e}")
             logger.warning("Falling back to mock mode")
+    
+    global job_store, job_runner
+    job_store = JobStore(settings.jobs_db_path)
+    job_runner = JobRunner(
+        job_store,
+        _analyze_for_job,
+        workers=settings.job_workers,
+        result_ttl=settings.job_result_ttl,
+        scheduler=get_scheduler(),
+        lease=settings.job_lease_seconds,
+        image_timeout=settings.job_image_timeout,
+        max_attempts=settings.job_max_attempts
+    )
+    await job_runner.start()
+    memory_watchdog.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release pooled upstream connections and stop job workers"""
+    await memory_watchdog.stop()
+    await get_gemini_proxy().close()
+    if job_runner is not None:
+        await job_runner.stop()
+    if job_store is not None:
+        job_store.close()
 
 
 @app.get("/")
@@ -62,8 +142,20 @@ async def root():
     }
 
 
+@app.get("/api/metrics")
+async def metrics():
+    """Counters, latency summaries (e.g. scheduler_queue_seconds by lane) and queue state"""
+    return {**get_metrics().snapshot(), "scheduler": get_scheduler().stats()}
+
+
 @app.post("/api/perception/analyze")
-async def analyze_ingredients(file: UploadFile = File(...)) -> JSONResponse:
+async def analyze_ingredients(
+    request: Request,
+    file: UploadFile = File(...),
+    tier: Optional[str] = None,
+    x_profile_token: Optional[str] = Header(default=None),
+    x_request_lane: Optional[str] = Header(default=None)
+) -> JSONResponse:
     """
     Analyze uploaded image and return structured ingredient data
     
@@ -72,6 +164,9 @@ async def analyze_ingredients(file: UploadFile = File(...)) -> JSONResponse:
     
     Args:
         file: Uploaded image (multipart/form-data)
+        tier: "fast", "balanced" or "accurate" (speed vs accuracy)
+        x_profile_token: Admin token requesting a profile of this request
+        x_request_lane: "batch" to yield to interactive traffic
         
     Returns:
         JSON with detected ingredients
@@ -87,17 +182,17 @@ async def analyze_ingredients(file: UploadFile = File(...)) -> JSONResponse:
         
         logger.info(f"Processing image: {file.filename} ({image.size})")
         
-        # Run perception pipeline
-        if settings.mock_mode:
-            result = _mock_perception_result()
-        else:
-            result = run_perception_pipeline(
-                image, 
-                timeout=settings.ml_inference_timeout
-            )
+        # Run perception pipeline (simulated in mock mode) when scheduled
+        result = await _schedule_perception(request, image, tier, x_profile_token, x_request_lane)
         
         return JSONResponse(content=result)
         
+    except HTTPException:
+        raise
+        
+    except SchedulerRejected as e:
+        raise _rejection(e)
+        
     except TimeoutError as e:
         logger.error(f"Timeout: {e}")
         raise HTTPException(status_code=504, detail="ML inference timeout")
@@ -109,9 +204,13 @@ async def analyze_ingredients(file: UploadFile = File(...)) -> JSONResponse:
 
 @app.post("/api/perception/analyze-for-gemini")
 async def analyze_for_gemini(
+    request: Request,
     file: UploadFile = File(...),
     cuisine: str = "Global/Fusion",
-    dietary_preferences: Dict[str, Any] = None
+    dietary_preferences: Dict[str, Any] = None,
+    tier: Optional[str] = None,
+    x_profile_token: Optional[str] = Header(default=None),
+    x_request_lane: Optional[str] = Header(default=None)
 ) -> JSONResponse:
     """
     Analyze image and prepare data in Gemini-compatible format
@@ -123,6 +222,9 @@ async def analyze_for_gemini(
         file: Uploaded image
         cuisine: Cuisine preference
         dietary_preferences: User dietary constraints
+        tier: "fast", "balanced" or "accurate" (speed vs accuracy)
+        x_profile_token: Admin token requesting a profile of this request
+        x_request_lane: "batch" to yield to interactive traffic
         
     Returns:
         Gemini-ready structured data
@@ -132,10 +234,7 @@ async def analyze_for_gemini(
         contents = await file.read()
         image = Image.open(io.BytesIO(contents)).convert("RGB")
         
-        if settings.mock_mode:
-            perception_data = _mock_perception_result()
-        else:
-            perception_data = run_perception_pipeline(image, timeout=settings.ml_inference_timeout)
+        perception_data = await _schedule_perception(request, image, tier, x_profile_token, x_request_lane)
         
         # Prepare for Gemini
         user_config = {
@@ -147,51 +246,325 @@ async def analyze_for_gemini(
         
         return JSONResponse(content=gemini_input)
         
+    except HTTPException:
+        raise
+        
+    except SchedulerRejected as e:
+        raise _rejection(e)
+        
+    except TimeoutError as e:
+        logger.error(f"Timeout: {e}")
+        raise HTTPException(status_code=504, detail="ML inference timeout")
+        
     except Exception as e:
         logger.error(f"Gemini adapter failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-def _mock_perception_result() -> Dict[str, Any]:
-    """Mock data for testing without GPU"""
+@app.post("/api/jobs", status_code=202)
+async def submit_job(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    priority: int = 0,
+    tier: Optional[str] = None
+) -> JSONResponse:
+    """
+    Queue a long-running analysis of one or more images
+    
+    Returns immediately; follow progress via /api/jobs/{id} (polling) or
+    /api/jobs/{id}/events (Server-Sent Events). Jobs survive restarts.
+    
+    Args:
+        files: Images to analyze (multipart/form-data, repeatable)
+        priority: Higher values run first
+        tier: "fast", "balanced" or "accurate", applied to every image
+        
+    Returns:
+        Job ID and status URLs
+    """
+    tier_options = _resolve_tier_or_400(tier)
+    inputs = []
+    for file in files:
+        if not file.content_type or not file.content_type.startswith("image/"):
+            raise HTTPException(status_code=400, detail=f"{file.filename} is not an image")
+        inputs.append((file.filename, await file.read()))
+    
+    # Each image costs one token; the images then run in the batch lane
+    client = _client_id(request)
+    try:
+        get_scheduler().admit(client, cost=len(inputs))
+    except SchedulerRejected as e:
+        raise _rejection(e)
+    
+    # Jobs exist for work that overruns interactive budgets, so each image
+    # gets at least JOB_IMAGE_TIMEOUT, or the tier's budget if that is longer
+    params = {
+        "client": client,
+        "tier": tier_options["name"],
+        "timeout": max(tier_options["timeout"], settings.job_image_timeout)
+    }
+    job_id = await asyncio.to_thread(job_store.submit, inputs, priority=priority, params=params)
+    job_runner.notify()
+    
+    return JSONResponse(status_code=202, content={
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/api/jobs/{job_id}",
+        "events_url": f"/api/jobs/{job_id}/events"
+    })
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str) -> JSONResponse:
+    """Poll job status, progress and (once finished) results"""
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return JSONResponse(content=_job_view(job))
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str) -> StreamingResponse:
+    """Stream job progress as Server-Sent Events until it finishes"""
+    if await asyncio.to_thread(job_store.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    
+    async def stream():
+        last = None
+        while True:
+            job = await asyncio.to_thread(job_store.get, job_id)
+            if job is None:
+                yield f"event: error\ndata: {json.dumps({'detail': 'Job expired'})}\n\n"
+                return
+            
+            view = _job_view(job, include_result=False)
+            state = (view["status"], view["progress"], view["message"])
+            if state != last:
+                yield f"event: progress\ndata: {json.dumps(view)}\n\n"
+                last = state
+            
+            if job["status"] in TERMINAL_STATUSES:
+                yield f"event: done\ndata: {json.dumps(_job_view(job))}\n\n"
+                return
+            await asyncio.sleep(0.5)
+    
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/api/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, x_admin_token: Optional[str] = Header(default=None)) -> PlainTextResponse:
+    """
+    Download a captured profile as collapsed stacks
+    
+    The output loads directly into speedscope or flamegraph.pl.
+    
+    Args:
+        profile_id: ID from metadata.profile.id
+        x_admin_token: Must match ADMIN_TOKEN
+    """
+    _require_admin(x_admin_token)
+    
+    path = get_profile_path(profile_id, settings.profiling_dir)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(path.read_text(encoding="utf-8"))
+
+
+@app.get("/api/admin/memory")
+async def memory_status(x_admin_token: Optional[str] = Header(default=None)):
+    """Current RSS, budget, in-flight requests and stored heap snapshots"""
+    _require_admin(x_admin_token)
+    snapshots = get_heap_snapshots()
     return {
-        "inventory": [
-            {
-                "name": "apple",
-                "quantity": "150g",
-                "confidence": 94.5,
-                "freshness": 85.0,
-                "category": "produce",
-                "scientificName": "Apple",
-                "estimatedMass": "150g",
-                "boundingBox": [100, 100, 200, 200],
-                "daysToConsume": 5
-            },
-            {
-                "name": "carrot",
-                "quantity": "120g",
-                "confidence": 88.2,
-                "freshness": 72.0,
-                "category": "produce",
-                "scientificName": "Carrot",
-                "estimatedMass": "120g",
-                "boundingBox": [250, 150, 350, 280],
-                "daysToConsume": 3
-            }
-        ],
-        "metadata": {
-            "inference_time": 0.05,
-            "model_version": "mock",
-            "detections_count": 2
-        }
+        "pid": os.getpid(),
+        "rss_bytes": current_rss(),
+        "ceiling_bytes": memory_watchdog.ceiling_bytes,
+        "recycling": memory_watchdog.recycling,
+        "in_flight_requests": in_flight_requests,
+        "tracemalloc": snapshots.tracing,
+        "snapshots": snapshots.list_snapshots()
     }
 
 
+@app.post("/api/admin/memory/snapshots")
+async def take_heap_snapshot(x_admin_token: Optional[str] = Header(default=None)):
+    """Take a tracemalloc snapshot (starts tracing on first call)"""
+    _require_admin(x_admin_token)
+    # Snapshotting walks the whole traced heap; keep the event loop serving
+    return await asyncio.to_thread(get_heap_snapshots().take)
+
+
+@app.delete("/api/admin/memory/snapshots")
+async def stop_heap_tracing(x_admin_token: Optional[str] = Header(default=None)):
+    """Stop tracemalloc and discard snapshots"""
+    _require_admin(x_admin_token)
+    get_heap_snapshots().stop()
+    return {"tracemalloc": False}
+
+
+@app.get("/api/admin/memory/diff")
+async def heap_diff(
+    base: str,
+    target: str,
+    limit: int = 25,
+    group_by: str = "lineno",
+    x_admin_token: Optional[str] = Header(default=None)
+):
+    """Top allocation changes between two snapshots, for leak hunting"""
+    _require_admin(x_admin_token)
+    if group_by not in ("lineno", "filename", "traceback"):
+        raise HTTPException(status_code=400, detail="group_by must be lineno, filename or traceback")
+    try:
+        diff = await asyncio.to_thread(get_heap_snapshots().diff, base, target, limit, group_by)
+        return {"base": base, "target": target, "diff": diff}
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+
+
+@app.post("/api/recipes/generate")
+async def generate_recipes(
+    gemini_input: Dict[str, Any] = Body(...),
+    x_gemini_api_key: Optional[str] = Header(default=None)
+) -> JSONResponse:
+    """
+    Generate recipes server-side through the pooled Gemini proxy
+    
+    Accepts the payload returned by /api/perception/analyze-for-gemini.
+    Identical inventory + cuisine + dietary combinations are served from cache.
+    
+    Args:
+        gemini_input: Output of prepare_gemini_input()
+        x_gemini_api_key: Optional per-user key (falls back to GEMINI_API_KEY)
+        
+    Returns:
+        JSON with generated protocols and a cache flag
+    """
+    try:
+        result = await get_gemini_proxy().generate_recipes(gemini_input, api_key=x_gemini_api_key)
+        return JSONResponse(content=result)
+        
+    except GeminiProxyError as e:
+        logger.error(f"Recipe generation failed: {e}")
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+
+async def _schedule_perception(
+    request: Request,
+    image: Image.Image,
+    tier: Optional[str],
+    profile_token: Optional[str],
+    lane: Optional[str]
+) -> Dict[str, Any]:
+    """Run the pipeline at the requested tier through the fair scheduler"""
+    lane = (lane or "interactive").lower()
+    if lane not in LANES:
+        raise HTTPException(status_code=400, detail=f"X-Request-Lane must be one of {', '.join(LANES)}")
+    tier_options = _resolve_tier_or_400(tier)
+    
+    # The tier carries its own timeout budget, enforced by the scheduler so
+    # an overrunning call keeps its slot until it really finishes
+    client = _client_id(request)
+    return await get_scheduler().submit(
+        functools.partial(
+            run_perception_pipeline,
+            image,
+            reuse_near_duplicates=settings.enable_near_duplicate_reuse,
+            profile=_should_profile(profile_token),
+            tier=tier_options["name"],
+            cache_scope=client,
+            inline=True
+        ),
+        client=client,
+        lane=lane,
+        timeout=tier_options["timeout"]
+    )
+
+
+def _resolve_tier_or_400(tier: Optional[str]) -> Dict[str, Any]:
+    """Resolve a tier query parameter, rejecting unknown names"""
+    try:
+        return resolve_tier(tier, settings)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"tier must be one of {', '.join(PERFORMANCE_TIERS)}")
+
+
+def _client_id(request: Request) -> str:
+    """
+    Identify the caller by a configured API key, else by peer address
+    
+    Unknown keys are ignored, so a client cannot mint fresh identities to
+    reset its token bucket or to read another client's near-duplicate cache.
+    """
+    key = request.headers.get("x-api-key")
+    if key and key in known_api_keys:
+        return key
+    return request.client.host if request.client else "anonymous"
+
+
+def _rejection(error: SchedulerRejected) -> HTTPException:
+    """Map a scheduler rejection to an HTTP error with Retry-After"""
+    headers = {"Retry-After": str(max(1, round(error.retry_after)))} if error.retry_after else None
+    return HTTPException(status_code=error.status_code, detail=str(error), headers=headers)
+
+
+def _analyze_for_job(image: Image.Image, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Per-image analysis used by background jobs (blocking; the runner enforces the deadline)"""
+    return run_perception_pipeline(
+        image,
+        reuse_near_duplicates=settings.enable_near_duplicate_reuse,
+        tier=params.get("tier"),
+        cache_scope=params.get("client", ""),
+        inline=True
+    )
+
+
+def _job_view(job: Dict[str, Any], include_result: bool = True) -> Dict[str, Any]:
+    """Public representation of a stored job"""
+    view = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "priority": job["priority"],
+        "progress": round(job["progress"], 3),
+        "message": job["message"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "expires_at": job["expires_at"]
+    }
+    if include_result:
+        view["result"] = job["result"]
+    return view
+
+
+def _is_admin(token: Optional[str]) -> bool:
+    """Check an admin header against the configured token"""
+    return bool(settings.admin_token) and token == settings.admin_token
+
+
+def _require_admin(token: Optional[str]):
+    """Reject requests without a valid admin token"""
+    if not _is_admin(token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+def _should_profile(profile_token: Optional[str]) -> bool:
+    """Profile on a valid admin header, otherwise at the configured sample rate"""
+    if _is_admin(profile_token):
+        return True
+    return settings.profiling_sample_rate > 0 and random.random() < settings.profiling_sample_rate
+
+
 if __name__ == "__main__":
     import uvicorn
+    # uvicorn ignores workers when reloading, so tuned worker counts win
+    reload = settings.environment == "development" and settings.uvicorn_workers <= 1
+    if settings.environment == "development" and not reload:
+        logger.info(f"Auto-reload disabled to run {settings.uvicorn_workers} workers")
     uvicorn.run(
         "main:app",
         host=settings.api_host,
         port=settings.api_port,
-        reload=settings.environment == "development"
+        reload=reload,
+        workers=settings.uvicorn_workers
     )
@@ -0,0 +1,52 @@
+"""Shared test fixtures"""
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+from app.perception.detector import IngredientDetector
+
+
+@pytest.fixture
+def sample_image():
+    """Create a simple test image"""
+    img_array = np.random.randint(0, 255, (640, 640, 3), dtype=np.uint8)
+    return Image.fromarray(img_array)
+
+
+class FakeBoxes:
+    """Minimal stand-in for ultralytics Boxes"""
+    
+    def __init__(self, rows):
+        self._rows = [
+            type("Box", (), {
+                "cls": torch.tensor([cls]),
+                "conf": torch.tensor([conf]),
+                "xyxy": torch.tensor([box], dtype=torch.float32)
+            })
+            for cls, conf, box in rows
+        ]
+    
+    def __len__(self):
+        return len(self._rows)
+    
+    def __getitem__(self, i):
+        return self._rows[i]
+
+
+@pytest.fixture
+def fake_detector():
+    """
+    Build an IngredientDetector around a scripted model
+    
+    The script is called like the YOLO model, (source, **kwargs), and
+    returns (class_id, confidence, [x1, y1, x2, y2]) rows.
+    """
+    def make(script):
+        def model(source, **kwargs):
+            return [type("Result", (), {"boxes": FakeBoxes(script(source, **kwargs))})]
+        detector = IngredientDetector()
+        detector.model = model
+        detector._initialized = True
+        return detector
+    return make
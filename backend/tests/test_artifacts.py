@@ -0,0 +1,55 @@
+"""Tests for the offline model artifact store"""
+import pytest
+
+from app.perception.artifacts import ArtifactError, ArtifactStore
+
+
+def test_store_registers_versions_and_verifies(tmp_path):
+    """Files are copied, checksummed and resolved by ACTIVE version"""
+    weights = tmp_path / "tiny.pt"
+    weights.write_bytes(b"weights-v1")
+    store = ArtifactStore(str(tmp_path / "models"))
+    
+    store.add("tiny", "1", {"weights": str(weights)})
+    weights.write_bytes(b"weights-v2")
+    store.add("tiny", "2", {"weights": str(weights)}, activate=False)
+    
+    assert store.versions("tiny") == ["1", "2"]
+    manifest = store.resolve("tiny")
+    assert manifest["version"] == "1"
+    assert store.path(manifest, "weights").read_bytes() == b"weights-v1"
+    assert store.verify("tiny", "2") == []
+    
+    store.activate("tiny", "2")
+    assert store.resolve("tiny")["version"] == "2"
+
+
+def test_corrupt_or_missing_artifacts_are_rejected(tmp_path):
+    """Checksum mismatches and unknown kinds/versions raise ArtifactError"""
+    weights = tmp_path / "tiny.pt"
+    weights.write_bytes(b"weights")
+    store = ArtifactStore(str(tmp_path / "models"))
+    manifest = store.add("tiny", "1", {"weights": str(weights)})
+    manifest["dir"] = str(tmp_path / "models" / "tiny" / "1")
+    
+    (tmp_path / "models" / "tiny" / "1" / "tiny.pt").write_bytes(b"tampered")
+    with pytest.raises(ArtifactError, match="Checksum"):
+        store.path(manifest, "weights")
+    assert store.verify("tiny") != []
+    
+    with pytest.raises(ArtifactError):
+        store.path(manifest, "onnx")
+    with pytest.raises(ArtifactError):
+        store.resolve("tiny", "9")
+
+
+def test_detector_never_downloads_missing_weights(tmp_path):
+    """An unregistered model fails fast instead of reaching for the network"""
+    from app.perception.detector import IngredientDetector
+    
+    detector = IngredientDetector(
+        model_path=str(tmp_path / "absent.pt"),
+        store=ArtifactStore(str(tmp_path / "models"))
+    )
+    with pytest.raises(ArtifactError, match="app.tools.models add"):
+        detector.load()
@@ -0,0 +1,87 @@
+"""Tests for resumable bulk perception"""
+import json
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from PIL import Image
+
+from app.tools.bulk import iter_images, run_bulk
+
+
+class _StubPipeline:
+    """Reports the image's marker pixel instead of running models"""
+
+    def __init__(self, crash_on=None, fail_on=None):
+        self.crash_on = crash_on
+        self.fail_on = fail_on
+
+    def run(self, image):
+        marker = image.getpixel((0, 0))[0]
+        if marker == self.crash_on:
+            os._exit(1)  # Simulates a killed run
+        if marker == self.fail_on:
+            raise RuntimeError("model error")
+        return {"inventory": [], "metadata": {"marker": marker}}
+
+
+def crashing_pipeline():
+    return _StubPipeline(crash_on=3)
+
+
+def failing_pipeline():
+    return _StubPipeline(fail_on=2)
+
+
+def stub_pipeline():
+    return _StubPipeline()
+
+
+def make_archive(directory, count=6):
+    directory.mkdir()
+    for i in range(count):
+        Image.new("RGB", (8, 8), (i, 0, 0)).save(directory / f"{i:02d}.png")
+
+
+def test_interrupted_run_resumes_from_checkpoint(tmp_path):
+    """A crashed run keeps finished results; the re-run only does the rest"""
+    source = tmp_path / "images"
+    make_archive(source)
+    output = tmp_path / "results.jsonl"
+    options = {"workers": 1, "prefetch": 1, "flush_every": 1, "torch_threads": 1}
+
+    with pytest.raises(BrokenProcessPool):
+        run_bulk(str(source), str(output), pipeline_factory=crashing_pipeline, **options)
+
+    summary = run_bulk(str(source), str(output), pipeline_factory=stub_pipeline, **options)
+
+    assert summary["skipped"] == 3
+    assert summary["processed"] == 3
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(r["key"] for r in records) == [f"{i:02d}.png" for i in range(6)]
+    assert [key for key, _ in iter_images(str(source), skip={"00.png", "01.png"})][0] == "02.png"
+
+
+def test_failed_images_are_retried_only_on_request(tmp_path):
+    """Errored images are checkpointed as failed, skipped on resume, re-run with retry_failed"""
+    source = tmp_path / "images"
+    make_archive(source, count=4)
+    (source / "zz.png").write_bytes(b"not an image")
+    output = tmp_path / "results.jsonl"
+    options = {"workers": 1, "prefetch": 2, "flush_every": 1, "torch_threads": 1}
+
+    first = run_bulk(str(source), str(output), pipeline_factory=failing_pipeline, **options)
+    assert first["processed"] == 5 and first["failed"] == 2
+
+    resumed = run_bulk(str(source), str(output), pipeline_factory=stub_pipeline, **options)
+    assert resumed["processed"] == 0 and resumed["skipped"] == 5
+
+    retried = run_bulk(str(source), str(output), pipeline_factory=stub_pipeline, retry_failed=True, **options)
+    assert retried["processed"] == 2 and retried["failed"] == 1
+
+    latest = {}
+    for line in output.read_text().splitlines():
+        record = json.loads(line)
+        latest[record["key"]] = record
+    assert latest["02.png"]["result"]["metadata"]["marker"] == 2
+    assert "error" in latest["zz.png"]
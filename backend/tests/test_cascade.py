@@ -0,0 +1,62 @@
+"""Tests for two-stage cascade detection"""
+from PIL import Image
+
+from app.perception.freshness import FreshnessEstimator
+from app.perception.pipeline import PerceptionPipeline
+from app.perception.tiers import PERFORMANCE_TIERS
+from app.perception.volume import VolumeEstimator
+
+
+def test_cascade_early_exit_and_refinement(sample_image, fake_detector):
+    """Cascade skips the full pass when confident and refines otherwise"""
+    calls = []
+    
+    def make_detector(low_res_rows, full_rows):
+        def model(source, **kwargs):
+            calls.append(kwargs.get("imgsz"))
+            return low_res_rows if kwargs.get("imgsz") else full_rows
+        return fake_detector(model)
+    
+    detector = make_detector([(47, 0.95, [10, 10, 60, 60])], [])
+    detections, stage = detector.detect_cascade(sample_image)
+    assert stage == "confident" and len(detections) == 1
+    assert calls == [320]
+    
+    calls.clear()
+    detector = make_detector([(0, 0.9, [0, 0, 5, 5])], [])
+    assert detector.detect_cascade(sample_image) == ([], "empty")
+    
+    calls.clear()
+    detector = make_detector([(47, 0.4, [100, 100, 150, 150])], [(47, 0.7, [5, 5, 45, 45])])
+    detections, stage = detector.detect_cascade(sample_image)
+    assert stage == "refined" and calls == [320, None]
+    # Region-pass boxes are shifted back into full-image coordinates
+    assert detections[0]["bbox"][0] > 5
+
+
+def test_cascade_gates_tiled_pass(fake_detector):
+    """A confident low-res pass skips tiling; an uncertain one falls back to it"""
+    large = Image.new("RGB", (3000, 2000), (90, 140, 60))
+    accurate = {"name": "accurate", **PERFORMANCE_TIERS["accurate"]}
+    calls = []
+    
+    def make_pipeline(low_res_rows):
+        def model(source, **kwargs):
+            calls.append(kwargs["imgsz"])
+            return low_res_rows if kwargs["imgsz"] == 320 else [(47, 0.7, [5, 5, 45, 45])]
+        pipeline = PerceptionPipeline(cascade_options={"low_res": 320})
+        pipeline.detector = fake_detector(model)
+        pipeline.freshness = FreshnessEstimator()
+        pipeline.volume = VolumeEstimator()
+        pipeline._initialized = True
+        return pipeline
+    
+    result = make_pipeline([(47, 0.95, [10, 10, 60, 60])]).run(large, accurate)
+    assert result["metadata"]["cascade_stage"] == "confident"
+    assert calls == [320]
+    
+    calls.clear()
+    result = make_pipeline([(47, 0.4, [100, 100, 150, 150])]).run(large, accurate)
+    assert result["metadata"]["cascade_stage"] == "refined"
+    # Whole-image pass plus a 3x2 grid of 1280px tiles
+    assert calls == [320] + [1280] * 7
@@ -0,0 +1,23 @@
+"""Tests for the shared decoded image buffer"""
+import numpy as np
+
+from app.perception.context import ImageContext
+from app.perception.freshness import FreshnessEstimator
+
+
+def test_image_context_shares_buffer(sample_image):
+    """Crops are views of the decoded buffer and scratch space is reused"""
+    ctx = ImageContext.from_image(sample_image)
+    crop = ctx.crop([100, 100, 200, 250])
+    
+    assert ctx.size == sample_image.size
+    assert crop.shape == (150, 100, 3)
+    assert np.shares_memory(crop, ctx.pixels)
+    assert np.array_equal(crop[..., ::-1], np.asarray(sample_image)[100:250, 100:200])
+    
+    first = ctx.scratch("float", (150, 100, 3))
+    second = ctx.scratch("float", (50, 50, 3))
+    assert np.shares_memory(first, second)
+    
+    result = FreshnessEstimator().estimate(ctx, [100, 100, 200, 250])
+    assert 0 <= result["freshness_score"] <= 1
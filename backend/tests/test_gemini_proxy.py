@@ -0,0 +1,118 @@
+"""Tests for the Gemini proxy against a local fake Gemini server"""
+import asyncio
+import json
+import pytest
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from app.adapters.gemini_proxy import GeminiProxy, GeminiProxyError, normalize_gemini_input
+
+
+def make_fake_gemini(fail_first: int = 0, delay: float = 0.0):
+    """Build a fake generateContent server that counts calls"""
+    fake = FastAPI()
+    fake.state.calls = 0
+
+    @fake.post("/v1beta/models/{model_action}")
+    async def generate(model_action: str, request: Request):
+        fake.state.calls += 1
+        if fake.state.calls <= fail_first:
+            return JSONResponse(status_code=503, content={"error": "overloaded"})
+        await asyncio.sleep(delay)
+        body = await request.json()
+        prompt = body["contents"][0]["parts"][0]["text"]
+        recipes = {"protocols": [{"title": "Test Dish", "prompt": prompt}]}
+        return {"candidates": [{"content": {"parts": [{"text": json.dumps(recipes)}]}}]}
+
+    return fake
+
+
+def make_input(names, cuisine="Italian"):
+    return {
+        "inventory": [{"name": n, "quantity": "100g", "confidence": 90, "boundingBox": [0, 0, 1, 1]} for n in names],
+        "context": {"cuisine": cuisine, "dietary": {"vegan": True, "keto": False}, "model_version": "x"},
+    }
+
+
+def make_proxy(fake, **kwargs):
+    return GeminiProxy(
+        api_key="test-key",
+        base_url="http://fake-gemini",
+        backoff_base=0.0,
+        transport=httpx.ASGITransport(app=fake),
+        **kwargs
+    )
+
+
+def test_normalize_ignores_order_and_noise():
+    """Ingredient order and per-shot fields must not change the key"""
+    a = make_input(["apple", "carrot"])
+    b = make_input(["Carrot", "apple"])
+    b["inventory"][0]["confidence"] = 10
+    assert normalize_gemini_input(a) == normalize_gemini_input(b)
+
+
+def test_proxy_caches_and_deduplicates():
+    """Repeated and concurrent identical requests hit upstream once"""
+    fake = make_fake_gemini(delay=0.05)
+    proxy = make_proxy(fake)
+
+    async def scenario():
+        first, second = await asyncio.gather(
+            proxy.generate_recipes(make_input(["apple"])),
+            proxy.generate_recipes(make_input(["apple"])),
+        )
+        third = await proxy.generate_recipes(make_input(["apple"]))
+        await proxy.close()
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+
+    assert fake.state.calls == 1
+    assert first["protocols"][0]["title"] == "Test Dish"
+    assert second["cached"] and third["cached"]
+    assert proxy.stats["deduplicated"] == 1
+
+
+def test_cancelled_owner_releases_waiters():
+    """Cancelling the request that owns the upstream call fails its waiters fast"""
+    fake = make_fake_gemini(delay=5.0)
+    proxy = make_proxy(fake)
+
+    async def scenario():
+        owner = asyncio.create_task(proxy.generate_recipes(make_input(["pear"])))
+        await asyncio.sleep(0.05)
+        waiter = asyncio.create_task(proxy.generate_recipes(make_input(["pear"])))
+        await asyncio.sleep(0.05)
+        owner.cancel()
+        with pytest.raises(GeminiProxyError) as exc:
+            await asyncio.wait_for(waiter, timeout=1.0)
+        await proxy.close()
+        return exc.value
+
+    error = asyncio.run(scenario())
+
+    assert error.status_code == 503
+    assert proxy.stats["deduplicated"] == 1
+
+
+def test_proxy_retries_transient_errors():
+    """503 responses are retried with backoff"""
+    fake = make_fake_gemini(fail_first=2)
+    proxy = make_proxy(fake, max_retries=3)
+
+    result = asyncio.run(proxy.generate_recipes(make_input(["banana"])))
+
+    assert fake.state.calls == 3
+    assert result["cached"] is False
+
+
+def test_proxy_gives_up_after_retries():
+    """Persistent upstream failures surface as GeminiProxyError"""
+    fake = make_fake_gemini(fail_first=10)
+    proxy = make_proxy(fake, max_retries=1)
+
+    with pytest.raises(GeminiProxyError):
+        asyncio.run(proxy.generate_recipes(make_input(["banana"])))
+    assert fake.state.calls == 2
@@ -0,0 +1,64 @@
+"""Tests for near-duplicate perceptual-hash index"""
+import numpy as np
+from PIL import Image, ImageEnhance
+
+from app.perception.image_index import NearDuplicateIndex, compute_phash, hamming_distance
+
+
+def make_scene(seed: int = 0) -> Image.Image:
+    """Smooth synthetic scene (random noise has no perceptual structure)"""
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 255, (8, 8, 3), dtype=np.uint8)
+    return Image.fromarray(coarse).resize((640, 480), Image.Resampling.BICUBIC)
+
+
+def sample_result():
+    return {
+        "inventory": [{"name": "apple", "boundingBox": [100, 100, 200, 200]}],
+        "metadata": {"model_version": "test"},
+    }
+
+
+def test_phash_tolerates_resize_and_lighting():
+    """Re-shot versions of a scene hash close together; other scenes don't"""
+    original = make_scene(0)
+    variant = ImageEnhance.Brightness(original.resize((320, 240))).enhance(1.1)
+    other = make_scene(1)
+
+    assert hamming_distance(compute_phash(original), compute_phash(variant)) <= 6
+    assert hamming_distance(compute_phash(original), compute_phash(other)) > 6
+
+
+def test_index_reuses_and_rescales_boxes():
+    """A near-duplicate lookup rescales boxes and reports the distance"""
+    index = NearDuplicateIndex(max_entries=4, max_distance=6)
+    original = make_scene(0)
+    index.add(compute_phash(original), original.size, sample_result())
+
+    smaller = original.resize((320, 240))
+    reused = index.lookup(compute_phash(smaller), smaller.size)
+
+    assert reused is not None
+    assert reused["inventory"][0]["boundingBox"] == [50.0, 50.0, 100.0, 100.0]
+    assert reused["metadata"]["near_duplicate"]["distance"] <= 6
+
+
+def test_index_evicts_least_recently_used():
+    """Index stays bounded and forgets the oldest image"""
+    index = NearDuplicateIndex(max_entries=2, max_distance=0)
+    hashes = [compute_phash(make_scene(seed)) for seed in range(5)]
+    for h in hashes:
+        index.add(h, (640, 480), sample_result())
+
+    assert len(index) == 2
+    assert index.lookup(hashes[0], (640, 480)) is None
+    assert index.lookup(hashes[-1], (640, 480)) is not None
+
+
+def test_index_keys_results_by_variant():
+    """A result stored for one tier is never served for another"""
+    index = NearDuplicateIndex(max_entries=4, max_distance=6)
+    index.add(0b1011, (100, 100), {"inventory": [], "metadata": {"tier": "fast"}}, variant="fast")
+    
+    assert index.lookup(0b1011, (100, 100), variant="accurate") is None
+    assert index.lookup(0b1011, (100, 100), variant="fast")["metadata"]["tier"] == "fast"
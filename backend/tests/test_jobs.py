@@ -0,0 +1,121 @@
+"""Tests for the durable job store and runner"""
+import asyncio
+import io
+import time
+from PIL import Image
+
+from app.jobs import JobStore, JobRunner
+
+
+def image_bytes():
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 30, 30)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_store_claims_by_priority(tmp_path):
+    """Higher priority first, then FIFO"""
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    low = store.submit([("a.png", b"x")], priority=0)
+    high = store.submit([("b.png", b"x")], priority=5)
+    later_low = store.submit([("c.png", b"x")], priority=0)
+    
+    assert [store.claim_next()["id"] for _ in range(3)] == [high, low, later_low]
+    assert store.claim_next() is None
+
+
+def test_jobs_survive_restart(tmp_path):
+    """Queued jobs and jobs whose lease lapsed are picked up by a new process"""
+    path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(path)
+    running = store.submit([("a.png", b"x")])
+    queued = store.submit([("b.png", b"x")])
+    store.claim_next(owner="dead-worker", lease=0.05)
+    store.close()
+    
+    time.sleep(0.1)
+    reopened = JobStore(path)
+    assert reopened.requeue_interrupted() == 1
+    assert {reopened.claim_next()["id"], reopened.claim_next()["id"]} == {running, queued}
+
+
+def test_live_lease_is_not_requeued(tmp_path):
+    """A sibling worker starting up leaves jobs another worker is running alone"""
+    path = str(tmp_path / "jobs.sqlite3")
+    worker_a = JobStore(path)
+    job_id = worker_a.submit([("a.png", b"x")])
+    worker_a.claim_next(owner="a", lease=60)
+    
+    worker_b = JobStore(path)
+    assert worker_b.requeue_interrupted() == 0
+    assert worker_b.claim_next(owner="b") is None
+    # Only the lease holder may record the outcome
+    assert not worker_b.finish(job_id, result={}, owner="b")
+    assert worker_a.renew_lease(job_id, "a")
+    assert worker_a.finish(job_id, result={}, owner="a")
+    assert worker_b.get(job_id)["status"] == "succeeded"
+
+
+def test_runner_completes_job_with_ttl(tmp_path):
+    """Runner records progress, results, and expires them after the TTL"""
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.submit([("a.png", image_bytes()), ("b.png", image_bytes())])
+    runner = JobRunner(store, lambda image, params: {"inventory": [], "size": list(image.size)}, result_ttl=0.2)
+    
+    asyncio.run(runner.run_job(store.claim_next(owner=runner.owner)))
+    
+    job = store.get(job_id)
+    assert job["status"] == "succeeded"
+    assert job["progress"] == 1
+    assert [r["filename"] for r in job["result"]["results"]] == ["a.png", "b.png"]
+    
+    time.sleep(0.3)
+    assert store.get(job_id) is None
+    assert store.purge_expired() == 1
+
+
+def test_runner_applies_job_tier_and_timeout(tmp_path):
+    """Images see the job's params, and the job's timeout overrides the runner default"""
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.submit([("slow.png", image_bytes())], params={"client": "c", "tier": "fast", "timeout": 0.05})
+    seen = []
+    
+    def analyze(image, params):
+        seen.append(params["tier"])
+        time.sleep(0.3)
+        return {"inventory": []}
+    
+    runner = JobRunner(store, analyze, image_timeout=10.0)
+    asyncio.run(runner.run_job(store.claim_next(owner=runner.owner)))
+    
+    assert seen == ["fast"]
+    assert "timeout" in store.get(job_id)["result"]["results"][0]["error"]
+
+
+def test_submit_rejects_unknown_tier():
+    """An unknown ?tier= on job submission is a 400"""
+    from fastapi.testclient import TestClient
+    import main
+    
+    response = TestClient(main.app).post(
+        "/api/jobs?tier=turbo", files={"files": ("a.png", image_bytes(), "image/png")}
+    )
+    assert response.status_code == 400
+    assert "tier" in response.json()["detail"]
+
+
+def test_job_fails_after_max_attempts(tmp_path):
+    """A job that keeps killing its worker is failed instead of requeued forever"""
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.submit([("poison.png", b"x")])
+    
+    for attempt in range(3):
+        assert store.claim_next(owner=f"w{attempt}", lease=0)["attempts"] == attempt + 1
+        time.sleep(0.01)
+        requeued = store.requeue_interrupted(max_attempts=3)
+        assert requeued == (1 if attempt < 2 else 0)
+    
+    job = store.get(job_id)
+    assert job["status"] == "failed" and "3 time(s)" in job["error"]
+    assert store.claim_next() is None
+    assert store.load_inputs(job_id) == []
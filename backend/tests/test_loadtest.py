@@ -0,0 +1,78 @@
+"""Tests for the load-test harness"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.tools.loadtest import compare_reports, is_jobs_endpoint, percentile, run_job, run_step
+
+
+def test_percentile_nearest_rank():
+    """Nearest-rank percentiles, clamped to the data"""
+    values = [5.0, 1.0, 4.0, 2.0, 3.0]
+    assert percentile(values, 50) == 3.0
+    assert percentile(values, 95) == 5.0
+    assert percentile(values, 0) == 1.0
+    assert percentile([7.0], 99) == 7.0
+    assert percentile([], 50) is None
+
+
+def test_compare_reports_matches_steps():
+    """Only steps present in both reports are compared"""
+    def step(endpoint, concurrency, rps, p95):
+        return {"endpoint": endpoint, "concurrency": concurrency, "throughput_rps": rps, "latency_ms": {"p95": p95}}
+    
+    baseline = {"steps": [step("/a", 1, 10.0, 100.0), step("/a", 4, 20.0, None)]}
+    current = {"steps": [step("/a", 1, 15.0, 80.0), step("/a", 4, 0.0, 50.0), step("/b", 1, 5.0, 10.0)]}
+    
+    lines = compare_reports(baseline, current)
+    assert len(lines) == 2
+    assert "+50.0%" in lines[0] and "p95 -20.0ms" in lines[0]
+    assert "-100.0%" in lines[1] and "p95 n/a" in lines[1]
+
+
+def _jobs_transport(final_status="succeeded", polls_until_done=2):
+    """Fake jobs API: accepts a batch, then reports running until done"""
+    state = {"polls": 0, "files": 0}
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "POST":
+            state["files"] = request.content.count(b'name="files"')
+            return httpx.Response(202, json={"job_id": "j1", "status": "queued", "status_url": "/api/jobs/j1"})
+        state["polls"] += 1
+        status = final_status if state["polls"] >= polls_until_done else "running"
+        return httpx.Response(200, json={"job_id": "j1", "status": status})
+    
+    return httpx.MockTransport(handler), state
+
+
+def test_run_job_polls_to_completion():
+    """A batch job is submitted as repeated files fields and polled until done"""
+    batch = [("a.jpg", b"x"), ("b.jpg", b"y"), ("c.jpg", b"z")]
+    
+    async def scenario(final_status):
+        transport, state = _jobs_transport(final_status)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            outcome = await run_job(client, "/api/jobs?tier=fast", batch, timeout=5.0, poll_interval=0.01)
+        return outcome, state
+    
+    outcome, state = asyncio.run(scenario("succeeded"))
+    assert outcome == "200" and state == {"polls": 2, "files": 3}
+    assert asyncio.run(scenario("failed"))[0] == "job_failed"
+
+
+def test_jobs_step_reports_images_per_second():
+    """Job steps count end-to-end completions and images"""
+    assert is_jobs_endpoint("/api/jobs?tier=fast") and not is_jobs_endpoint("/api/jobs/abc")
+    
+    async def scenario():
+        transport, _ = _jobs_transport(polls_until_done=1)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await run_step(client, "/api/jobs", [("a.jpg", b"x")], 1, 0.3, 5.0, None, batch_size=3)
+    
+    step = asyncio.run(scenario())
+    assert step["requests"] > 0 and step["error_rate"] == 0
+    assert step["batch_size"] == 3
+    assert step["images_per_s"] == pytest.approx(step["throughput_rps"] * 3, rel=0.05)
+    json.dumps(step)
@@ -0,0 +1,38 @@
+"""Tests for the RSS watchdog and heap snapshots"""
+from app.memory import HeapSnapshots, MemoryWatchdog, current_rss
+
+
+def test_watchdog_recycles_over_ceiling():
+    """Over the ceiling (even after trimming) the recycle hook fires once"""
+    recycled = []
+    watchdog = MemoryWatchdog(ceiling_bytes=1024, on_recycle=lambda: recycled.append(True))
+    
+    assert watchdog.check() == "recycle"
+    assert watchdog.recycling and recycled == [True]
+    
+    roomy = MemoryWatchdog(ceiling_bytes=current_rss() * 4, on_recycle=lambda: recycled.append(True))
+    assert roomy.check() == "ok"
+    assert recycled == [True]
+    
+    # A lone process would just exit, so it reports instead of recycling
+    lone = MemoryWatchdog(ceiling_bytes=1024, on_recycle=lambda: recycled.append(True), supervised=False)
+    assert lone.check() == "over"
+    assert not lone.recycling and recycled == [True]
+
+
+def test_heap_snapshot_diff_finds_growth():
+    """An allocation made between snapshots tops the diff"""
+    snapshots = HeapSnapshots(frames=5, keep=2)
+    try:
+        base = snapshots.take()["id"]
+        retained = [bytearray(1024) for _ in range(2000)]
+        target = snapshots.take()["id"]
+        
+        diff = snapshots.diff(base, target, limit=5)
+        assert diff[0]["size_diff_bytes"] >= 2000 * 1024
+        assert any("test_memory.py" in line for line in diff[0]["location"])
+        
+        snapshots.take()
+        assert [s["id"] for s in snapshots.list_snapshots()] == [target, "3"]
+    finally:
+        snapshots.stop()
@@ -8,17 +8,10 @@ from app.perception.volume import VolumeEstimator
 from app.perception.pipeline import run_perception_pipeline
 
 
-@pytest.fixture
-def sample_image():
-    """Create a simple test image"""
-    img_array = np.random.randint(0, 255, (640, 640, 3), dtype=np.uint8)
-    return Image.fromarray(img_array)
-
-
 @pytest.fixture
 def mock_detector(monkeypatch):
     """Mock detector to avoid loading actual model in tests"""
-    def mock_detect(self, image, conf_threshold=0.25):
+    def mock_detect(self, image, conf_threshold=0.25, **kwargs):
         return [
             {
                 "name": "apple",
@@ -0,0 +1,32 @@
+"""Tests for per-request sampling profiles"""
+import os
+
+from app.perception.profiling import SamplingProfiler, get_profile_path, save_profile
+
+
+def test_sampling_profiler_captures_stacks(tmp_path):
+    """Profiler records collapsed stacks for the wrapped thread"""
+    def busy_app_code():
+        total = 0
+        for i in range(2_000_000):
+            total += i * i
+        return total
+    
+    with SamplingProfiler(interval=0.001) as profiler:
+        busy_app_code()
+    
+    assert profiler.samples > 0
+    assert "busy_app_code" in profiler.collapsed()
+    
+    profile_id = save_profile(profiler, str(tmp_path))
+    assert get_profile_path(profile_id, str(tmp_path)) is not None
+    assert get_profile_path("../etc/passwd", str(tmp_path)) is None
+    
+    # Retention keeps only the newest profiles
+    for _ in range(2):
+        save_profile(profiler, str(tmp_path), keep=0)
+    for age, old_file in enumerate(tmp_path.glob("*.folded"), start=1):
+        os.utime(old_file, (0, age))
+    newest = save_profile(profiler, str(tmp_path), keep=2)
+    assert len(list(tmp_path.glob("*.folded"))) == 2
+    assert get_profile_path(newest, str(tmp_path)) is not None
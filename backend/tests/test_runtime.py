@@ -0,0 +1,63 @@
+"""Tests for CPU partitioning and thread tuning"""
+import queue
+import sys
+import threading
+
+from app import runtime
+from app.runtime import partition_cpus
+from app.tools import tune
+from app.tools.tune import candidate_configs
+
+
+def test_cpu_partition_is_disjoint():
+    """Worker CPU sets never overlap and cover all given CPUs"""
+    cpus = list(range(8))
+    parts = partition_cpus(3, cpus)
+    flat = [cpu for part in parts for cpu in part]
+    assert sorted(flat) == sorted(set(flat))
+    assert sorted(flat) == cpus
+    assert len(parts) == 3 and all(parts)
+
+
+def test_candidate_configs_fit_cpu_budget():
+    """Tuner never proposes more torch threads than CPUs"""
+    for config in candidate_configs(4):
+        assert config["workers"] * config["torch_intra_op"] <= 4
+
+
+def test_worker_slot_without_fcntl(monkeypatch):
+    """Platforms without fcntl (Windows) skip slot pinning instead of failing"""
+    monkeypatch.setitem(sys.modules, "fcntl", None)
+    monkeypatch.setattr(runtime, "_slot_lock_file", None)
+    assert runtime.claim_worker_slot(2) == -1
+
+
+def test_worker_failure_during_measurement_is_reported(monkeypatch):
+    """A pipeline error after the barrier reaches the parent as a failed config"""
+    class FailingPipeline:
+        def initialize(self):
+            pass
+
+        def run(self, image):
+            raise RuntimeError("out of memory")
+
+    monkeypatch.setattr("app.perception.pipeline.PerceptionPipeline", FailingPipeline)
+    monkeypatch.setattr(tune, "apply_thread_limits", lambda **kwargs: None)
+    monkeypatch.setattr(tune, "_load_images", lambda images_dir: [None])
+    config = {"workers": 1, "torch_intra_op": 1, "torch_inter_op": 1, "cv2_threads": 1}
+    results = queue.Queue()
+
+    tune._bench_worker(config, None, None, 0.0, 1.0, threading.Barrier(1), results)
+    latencies, error = tune._collect_results(results, 1, timeout=1.0)
+
+    assert latencies == []
+    assert "out of memory" in error
+
+
+def test_missing_worker_result_is_reported():
+    """A worker that dies without reporting fails the config instead of raising queue.Empty"""
+    results = queue.Queue()
+    results.put({"latencies": [0.1, 0.2]})
+    latencies, error = tune._collect_results(results, 2, timeout=0.1)
+    assert latencies == [0.1, 0.2]
+    assert "no result" in error
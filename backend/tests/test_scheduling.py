@@ -0,0 +1,152 @@
+"""Tests for the fair multi-tenant scheduler"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import scheduling
+from app.scheduling import FairScheduler, SchedulerRejected, TokenBucket, parse_weights
+
+
+async def _run_in_order(scheduler, submissions):
+    """Block the only slot, queue submissions, then record execution order"""
+    order = []
+    gate = threading.Event()
+    blocker = asyncio.create_task(scheduler.submit(gate.wait, client="blocker"))
+    await asyncio.sleep(0.05)
+    
+    tasks = []
+    for label, client, lane in submissions:
+        tasks.append(asyncio.create_task(
+            scheduler.submit(order.append, label, client=client, lane=lane, charge=False)
+        ))
+        await asyncio.sleep(0)
+    
+    gate.set()
+    await asyncio.gather(blocker, *tasks)
+    scheduler.shutdown()
+    return order
+
+
+def test_weighted_fair_share_between_clients():
+    """A client's backlog is interleaved with others in proportion to weight"""
+    scheduler = FairScheduler(slots=1, weights={"b": 2.0})
+    submissions = [(f"a{i}", "a", "interactive") for i in range(4)]
+    submissions += [(f"b{i}", "b", "interactive") for i in range(4)]
+    
+    order = asyncio.run(_run_in_order(scheduler, submissions))
+    
+    assert order == ["b0", "a0", "b1", "b2", "a1", "b3", "a2", "a3"]
+
+
+def test_interactive_lane_runs_before_batch():
+    """Queued batch work yields to interactive work submitted later"""
+    scheduler = FairScheduler(slots=1)
+    submissions = [("batch0", "bulk", "batch"), ("batch1", "bulk", "batch"), ("ui", "user", "interactive")]
+    
+    order = asyncio.run(_run_in_order(scheduler, submissions))
+    
+    assert order == ["ui", "batch0", "batch1"]
+    assert scheduler.stats()["lanes"]["batch"] == {"queued": 0, "running": 0}
+
+
+def test_token_bucket_rate_limits_per_client():
+    """Bursts beyond the bucket are rejected with a retry hint; clients are independent"""
+    bucket = TokenBucket(rate=2.0, burst=2)
+    assert bucket.try_acquire(now=bucket.updated) == 0
+    assert bucket.try_acquire(now=bucket.updated) == 0
+    assert bucket.try_acquire(now=bucket.updated) == pytest.approx(0.5)
+    assert bucket.try_acquire(now=bucket.updated + 0.5) == 0
+    
+    scheduler = FairScheduler(rate=1.0, burst=2)
+    scheduler.admit("a")
+    scheduler.admit("a")
+    with pytest.raises(SchedulerRejected) as exc:
+        scheduler.admit("a")
+    assert exc.value.status_code == 429 and exc.value.retry_after > 0
+    scheduler.admit("b")
+    scheduler.shutdown()
+    
+    assert parse_weights("key-1=3, other=0.5") == {"key-1": 3.0, "other": 0.5}
+
+
+def test_timed_out_call_keeps_its_slot():
+    """The caller sees the deadline, but the next call waits for the overrun"""
+    scheduler = FairScheduler(slots=1)
+    active, peak = [0], [0]
+    
+    def work(duration):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        time.sleep(duration)
+        active[0] -= 1
+        return duration
+    
+    async def scenario():
+        started = time.perf_counter()
+        with pytest.raises(TimeoutError):
+            await scheduler.submit(work, 0.3, client="a", timeout=0.05)
+        assert time.perf_counter() - started < 0.25
+        assert scheduler.stats()["lanes"]["interactive"]["running"] == 1
+        
+        results = await asyncio.gather(*(
+            scheduler.submit(work, 0.01, client=f"c{i}", timeout=1.0) for i in range(4)
+        ))
+        assert results == [0.01] * 4
+    
+    asyncio.run(scenario())
+    scheduler.shutdown()
+    assert peak[0] == 1
+
+
+def test_detector_serializes_model_calls(sample_image, fake_detector):
+    """Concurrent scheduler slots never run the shared model at once"""
+    active, peak = [0], [0]
+    guard = threading.Lock()
+    
+    def model(source, **kwargs):
+        with guard:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with guard:
+            active[0] -= 1
+        return [(47, 0.9, [0, 0, 10, 10])]
+    
+    detector = fake_detector(model)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: detector.detect(sample_image), range(8)))
+    
+    assert peak[0] == 1
+    assert all(len(r) == 1 for r in results)
+
+
+def test_bucket_map_stays_bounded_under_client_churn(monkeypatch):
+    """Clients that never go idle still cannot grow the bucket map forever"""
+    monkeypatch.setattr(scheduling, "_MAX_IDLE_BUCKETS", 8)
+    scheduler = FairScheduler(rate=0.001, burst=1)
+    for i in range(100):
+        scheduler.admit(f"client-{i}")
+    assert len(scheduler._buckets) <= 8
+    scheduler.shutdown()
+
+
+def test_client_identity_ignores_unknown_api_keys(monkeypatch):
+    """Only configured keys name a client; anything else is the peer address"""
+    from starlette.requests import Request
+    import main
+    
+    monkeypatch.setattr(main, "known_api_keys", {"partner"})
+    
+    def request(headers):
+        return Request({
+            "type": "http",
+            "headers": [(k.encode(), v.encode()) for k, v in headers.items()],
+            "client": ("10.0.0.5", 4321),
+        })
+    
+    assert main._client_id(request({"x-api-key": "partner"})) == "partner"
+    assert main._client_id(request({"x-api-key": "forged"})) == "10.0.0.5"
+    assert main._client_id(request({"x-client-id": "partner"})) == "10.0.0.5"
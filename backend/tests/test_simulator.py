@@ -0,0 +1,37 @@
+"""Tests for the mock-mode pipeline simulator"""
+import json
+
+import pytest
+
+from app.perception.simulator import PipelineSimulator
+from app.perception.tiers import PERFORMANCE_TIERS
+
+
+def test_simulator_is_deterministic(sample_image, tmp_path):
+    """Same seed and image give the same result; replay uses recorded latencies"""
+    # A high mean makes an empty draw practically impossible
+    a = PipelineSimulator(seed=7, latency_mode="none", detections_mean=8).run(sample_image)
+    b = PipelineSimulator(seed=7, latency_mode="none", detections_mean=8).run(sample_image)
+    assert a["inventory"]
+    a["metadata"].pop("inference_time")
+    b["metadata"].pop("inference_time")
+    assert a == b
+    
+    replay = tmp_path / "latencies.json"
+    replay.write_text(json.dumps({"detect": [0.01], "freshness": [0.002]}))
+    simulator = PipelineSimulator(seed=1, latency_mode="replay", replay_file=str(replay), detections_mean=8)
+    result = simulator.run(sample_image)
+    assert result["metadata"]["stage_times"]["detect"] == 0.01
+    
+    # Replayed (default-tier) latencies are scaled by the tier's cost
+    fast = simulator.run(sample_image, {"name": "fast", **PERFORMANCE_TIERS["fast"]})
+    assert fast["metadata"]["stage_times"]["detect"] == pytest.approx(0.01 * (320 / 640) ** 2, abs=1e-4)
+
+
+def test_simulator_empty_result_keeps_shape(sample_image):
+    """An empty draw still returns inventory and metadata, like the real pipeline"""
+    fast = {"name": "fast", **PERFORMANCE_TIERS["fast"]}
+    empty = PipelineSimulator(seed=3, latency_mode="none", detections_mean=0).run(sample_image, fast)
+    
+    assert empty["inventory"] == []
+    assert empty["metadata"]["tier"] == "fast" and empty["metadata"]["detections_count"] == 0
@@ -0,0 +1,72 @@
+"""Tests for per-request performance tiers"""
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from app.config import Settings
+from app.perception.detector import _tile_grid
+from app.perception.freshness import FreshnessEstimator
+from app.perception.pipeline import PerceptionPipeline
+from app.perception.simulator import PipelineSimulator
+from app.perception.tiers import PERFORMANCE_TIERS, resolve_tier
+from app.perception.volume import VolumeEstimator
+
+
+def test_performance_tiers(sample_image):
+    """Tiers resolve with their budgets, shape detection and are reported"""
+    settings = Settings(ml_inference_timeout=2.0, tier_fast_timeout=0.5)
+    fast = resolve_tier("fast", settings)
+    assert fast["timeout"] == 0.5 and fast["imgsz"] < resolve_tier(None, settings)["imgsz"]
+    with pytest.raises(ValueError):
+        resolve_tier("turbo", settings)
+    
+    # Tiles overlap and cover the image; small images stay single-pass
+    starts, size = _tile_grid(4000, 1280, 0.2, 4)
+    assert starts[0] == 0 and starts[-1] + size >= 4000
+    assert all(b - a < size for a, b in zip(starts, starts[1:]))
+    assert _tile_grid(800, 1280, 0.2, 4) == ([0], 800)
+    
+    simulator = PipelineSimulator(seed=3, latency_mode="none", detections_mean=30, max_detections=50)
+    result = simulator.run(sample_image, fast)
+    assert result["metadata"]["tier"] == "fast"
+    assert result["metadata"]["detections_count"] <= fast["max_det"]
+
+
+def test_pipeline_applies_tier(sample_image, fake_detector):
+    """The tier shapes the model call and is reported, with or without detections"""
+    calls = []
+    rows = [(47, 0.9, [100, 100, 200, 200])]
+    
+    def model(source, **kwargs):
+        calls.append(kwargs)
+        return rows
+    
+    pipeline = PerceptionPipeline()
+    pipeline.detector = fake_detector(model)
+    pipeline.freshness = FreshnessEstimator()
+    pipeline.freshness.load()
+    pipeline.volume = VolumeEstimator()
+    pipeline._initialized = True
+    
+    fast = {"name": "fast", **PERFORMANCE_TIERS["fast"]}
+    result = pipeline.run(sample_image, fast)
+    assert calls[-1]["imgsz"] == 320 and calls[-1]["max_det"] == 20 and calls[-1]["conf"] == 0.35
+    assert result["metadata"]["tier"] == "fast"
+    assert [item["name"] for item in result["inventory"]] == ["apple"]
+    
+    rows.clear()
+    result = pipeline.run(sample_image, fast)
+    assert result["inventory"] == [] and result["metadata"]["tier"] == "fast"
+
+
+def test_endpoints_reject_unknown_tier(sample_image):
+    """An unknown ?tier= is a client error, not a 500"""
+    buf = io.BytesIO()
+    sample_image.save(buf, format="PNG")
+    client = TestClient(main.app)
+    for url in ("/api/perception/analyze", "/api/perception/analyze-for-gemini"):
+        response = client.post(f"{url}?tier=turbo", files={"file": ("a.png", buf.getvalue(), "image/png")})
+        assert response.status_code == 400, url
+        assert "tier" in response.json()["detail"]